@@ -1,9 +1,19 @@
+import concurrent.futures
+import copy
+import heapq
+import importlib
 import inspect
+import json
 import logging
 import math
+import multiprocessing
 import os
+import random
 import re
+import shutil
 import sys
+import tempfile
+import threading
 import time
 import warnings
 from datetime import datetime
@@ -11,49 +21,33 @@ from multiprocessing import Pool
 from typing import OrderedDict
 
 import numpy as np
+import scipy.sparse as sparse
 import pandas as pd
 import pandas as pandas
 #import modin.pandas as pd #https://modin.readthedocs.io/
-import ray
-import scipy.stats as sta
-from bitarray import bitarray
-from bitarray import util as bautil
-from deap import algorithms, base, creator, tools
-from imblearn.over_sampling import RandomOverSampler
-from joblib import Parallel, delayed, dump
-from memory_profiler import memory_usage
-from modin.config import ProgressBar
-from scipy.special import comb
-from sklearn import linear_model, neighbors, preprocessing, svm, tree, utils
-from sklearn.base import ClassifierMixin, RegressorMixin
-from sklearn.discriminant_analysis import QuadraticDiscriminantAnalysis
-from sklearn.ensemble import (AdaBoostClassifier, GradientBoostingClassifier,
-                              GradientBoostingRegressor,
-                              HistGradientBoostingClassifier,
-                              RandomForestClassifier, StackingClassifier,
-                              VotingClassifier)
+from joblib import Parallel, delayed, dump, load
+from joblib import hash as hash_obj
+from joblib.externals.loky import get_reusable_executor
+from joblib.externals.loky.process_executor import ShutdownExecutorError
+from sklearn import preprocessing, utils
+from sklearn.base import ClassifierMixin, RegressorMixin, clone
 from sklearn.exceptions import ConvergenceWarning
-from sklearn.experimental import enable_iterative_imputer
+from sklearn.experimental import enable_halving_search_cv, enable_iterative_imputer
 from sklearn.feature_extraction import text
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.gaussian_process import GaussianProcessClassifier
 from sklearn.impute import IterativeImputer
 from sklearn.metrics import confusion_matrix, get_scorer
-from sklearn.model_selection import GridSearchCV, train_test_split
-from sklearn.naive_bayes import GaussianNB, MultinomialNB
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.neural_network import MLPClassifier
+from sklearn.model_selection import (GridSearchCV, HalvingRandomSearchCV,
+                                     cross_val_score, train_test_split)
 from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
-from sklearn.svm import SVC
-from sklearn.tree import DecisionTreeClassifier
-from skopt import BayesSearchCV
 from tqdm import tqdm
 #from tpot import TPOTClassifier
-from xgboost import XGBClassifier, XGBRegressor, XGBRFRegressor
+#heavy and optional dependencies (ray, deap, skopt, xgboost, imblearn, scipy.stats, the estimators)
+#are imported on demand by the functions that use them: `import autoML` stays fast for scoring jobs
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 
-def _flush_intermediate_steps(obj, label_list = [''], dth=None, index=False, output_type='gzip', overwrite=True):
+def _intermediate_file_path(label_list = [''], dth=None, output_type='gzip'):
     if dth is None:
         dth = datetime.now()
     #saving df in a csv file
@@ -73,7 +67,11 @@ def _flush_intermediate_steps(obj, label_list = [''], dth=None, index=False, out
     if not os.path.exists(filedir):
         os.mkdir(filedir)
 
-    file_path = os.path.join(filedir, filename)
+    return os.path.join(filedir, filename)
+
+def _flush_intermediate_steps(obj, label_list = [''], dth=None, index=False, output_type='gzip', overwrite=True):
+    file_path = _intermediate_file_path(label_list, dth, output_type)
+    filename = os.path.basename(file_path)
     
     if not(overwrite) and os.path.exists(file_path):
         return None
@@ -87,45 +85,248 @@ def _flush_intermediate_steps(obj, label_list = [''], dth=None, index=False, out
     logging.info(filename + ' saved')
     sys.stdout.flush()
 
-best_results = {} #TODO: relocate to a better place
+def _append_intermediate_steps(record, label_list = [''], dth=None):
+    #one json line per record: the file is never rewritten
+    file_path = _intermediate_file_path(label_list, dth, 'jsonl')
+    with open(file_path, 'a') as f:
+        f.write(json.dumps(record, default=str) + '\n')
+
+def _result_row2record(result_row):
+    record = {}
+    for k, v in result_row.items():
+        if k == 'algorithm':
+            v = str(v)
+        elif k == 'features':
+            v = list(v)
+        elif isinstance(v, np.ndarray):
+            v = v.tolist()
+        elif isinstance(v, np.generic):
+            v = v.item()
+        record[k] = v
+    return record
+
+class ResultsStore:
+    #columnar results of one target: typed chunked arrays instead of a growing DataFrame
+    CHUNK_SIZE = 1024
+
+    def __init__(self, columns, main_metric, feature_names, top_k=10, spill_dir=None):
+        self.columns = list(columns)
+        self.main_metric = main_metric
+        self.feature_names = list(feature_names)
+        self.feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        self.numeric_columns = [c for c in self.columns if c not in ['algorithm', 'params', 'features', 'confusion_matrix']]
+        self.numeric_index = {c: i for i, c in enumerate(self.numeric_columns)}
+        self.top_k = top_k
+        self.spill_dir = spill_dir
+        self.size = 0
+        self.__numeric_chunks = [] #float64 (CHUNK_SIZE, n_numeric)
+        self.__algo_chunks = [] #int32 algorithm id
+        self.algo_classes = [] #algorithm id -> class
+        self.features_masks = [] #integer bitmask of the features
+        self.params = []
+        self.confusion_matrices = []
+        self.estimators = {} #row -> fitted estimator (top-k and best of each algorithm)
+        self.spilled = {} #row -> joblib file
+        self.__rows_index = {} #(algorithm id, features bitmask) -> first row
+        #retained rows, updated by append: min heap of the top-k (score, -row) and best row of each algorithm
+        self.__top_heap = []
+        self.__best_algo = {} #algorithm id -> ((score, -row), row)
+
+    def __len__(self):
+        return self.size
+
+    def features_mask(self, col_tuple):
+        #same bit order of the GA individuals (first feature is the most significant bit)
+        n = len(self.feature_names)
+        mask = 0
+        for c in col_tuple:
+            mask |= 1 << (n - 1 - self.feature_index[c])
+        return mask
+
+    def features_tuple(self, mask):
+        n = len(self.feature_names)
+        return tuple([name for i, name in enumerate(self.feature_names) if (mask >> (n - 1 - i)) & 1])
+
+    def append(self, result_row):
+        row = self.size
+        if row % self.CHUNK_SIZE == 0:
+            self.__numeric_chunks.append(np.full((self.CHUNK_SIZE, len(self.numeric_columns)), np.nan))
+            self.__algo_chunks.append(np.zeros(self.CHUNK_SIZE, dtype=np.int32))
+        chunk, pos = divmod(row, self.CHUNK_SIZE)
+        for col, j in self.numeric_index.items():
+            if col in result_row:
+                self.__numeric_chunks[chunk][pos, j] = result_row[col]
+        
+        algo_class = result_row['algorithm'].__class__
+        if algo_class not in self.algo_classes:
+            self.algo_classes.append(algo_class)
+        algo_id = self.algo_classes.index(algo_class)
+        self.__algo_chunks[chunk][pos] = algo_id
+        features_mask = self.features_mask(result_row['features'])
+        self.features_masks.append(features_mask)
+        self.__rows_index.setdefault((algo_id, features_mask), row)
+        self.params.append(result_row['params'])
+        self.confusion_matrices.append(result_row.get('confusion_matrix'))
+        self.size += 1
+        
+        self.estimators[row] = result_row['algorithm']
+        self.__evict_estimators(row, algo_id, self.__rank_key(row, self.__numeric_chunks[chunk][pos, self.numeric_index[self.main_metric]]
+                                                              , self.__numeric_chunks[chunk][pos, self.numeric_index['predict_time']]))
+        return row
+
+    def __rank_key(self, row, score, predict_time):
+        #the single order of the results (greater is better): main metric, then faster predict, then train order
+        #(eviction, best_row, best_estimators and to_dataframe)
+        return (np.nan_to_num(score, nan=-np.inf), -np.nan_to_num(predict_time, nan=np.inf), -row)
+
+    def __evict_estimators(self, row, algo_id, key):
+        #the evicted estimators never come back to the top: only the rows leaving the top-k
+        #or the best of their algorithm are candidates (no scan of the retained rows)
+        candidates = []
+        if len(self.__top_heap) < self.top_k:
+            heapq.heappush(self.__top_heap, (key, row))
+        elif self.top_k > 0:
+            candidates.append(heapq.heappushpop(self.__top_heap, (key, row))[1])
+        else:
+            candidates.append(row)
+        best = self.__best_algo.get(algo_id)
+        if best is None or key > best[0]:
+            self.__best_algo[algo_id] = (key, row)
+            if best is not None:
+                candidates.append(best[1])
+        else:
+            candidates.append(row)
+        keep = set([r for _, r in self.__top_heap] + [r for _, r in self.__best_algo.values()])
+        for r in set(candidates):
+            if r not in self.estimators or r in keep:
+                continue
+            if self.spill_dir is not None:
+                self.spilled[r] = os.path.join(self.spill_dir, 'estimator_' + str(id(self)) + '_' + str(r) + '.joblib')
+                dump(self.estimators[r], self.spilled[r])
+            del(self.estimators[r])
+
+    def column(self, col):
+        if col == 'algo_id':
+            chunks = self.__algo_chunks
+        else:
+            j = self.numeric_index[col]
+            chunks = [c[:, j] for c in self.__numeric_chunks]
+        if len(chunks) == 0:
+            return np.array([])
+        return np.concatenate(chunks)[:self.size]
+
+    def find(self, algo_class, col_tuple):
+        if algo_class not in self.algo_classes:
+            return None
+        return self.__rows_index.get((self.algo_classes.index(algo_class), self.features_mask(col_tuple)))
 
-def flushResults(automl_obj, y):
-    global best_results
-    
-    def processing_test_datasets():
-        for file, df_test in automl_obj.test_df_map.items():
-            df_predict = pd.DataFrame(columns=automl_obj.y_colname_list)
-            for y, result in best_results.items(): #TODO: parallelize
-                if automl_obj.predict_proba:
-                    df_predict[y] = pd.DataFrame(result['algorithm'].predict_proba(df_test[automl_obj.getFeaturesNames(y)])).iloc[:,1]
-                else:
-                    y_pred = result['algorithm'].predict(df_test[automl_obj.getFeaturesNames(y)])
-                    y_pred = automl_obj.y_encoder_map[y].inverse_transform(np.asanyarray(y_pred).reshape(-1, 1))[:,0]
-                    df_predict[y] = pd.DataFrame(y_pred)
-            _flush_intermediate_steps(df_predict, ['predict', automl_obj.ds_name, file]
-                                    , output_type='csv', overwrite=True)
+    def get_estimator(self, row):
+        if row in self.estimators:
+            return self.estimators[row]
+        if row in self.spilled:
+            return load(self.spilled[row])
+        return None
+
+    def best_row(self):
+        #first row of to_dataframe() (the best result is always retained in memory)
+        if len(self.estimators) == 0:
+            return None
+        metric = self.column(self.main_metric)
+        predict_time = self.column('predict_time')
+        return max(self.estimators.keys(), key=lambda r: self.__rank_key(r, metric[r], predict_time[r]))
+
+    def best_estimators(self):
+        #retained estimators, best first
+        metric = self.column(self.main_metric)
+        predict_time = self.column('predict_time')
+        rows = sorted(self.estimators.keys(), key=lambda r: self.__rank_key(r, metric[r], predict_time[r]), reverse=True)
+        return [(self.estimators[r], self.params[r]) for r in rows]
+
+    def to_dataframe(self, sort=True):
+        #'algorithm': fitted estimator retained in memory (None when evicted), 'algorithm_class': class of every row
+        #and 'estimator_file': joblib file of a spilled estimator (None otherwise)
+        data = {}
+        for col in self.columns:
+            if col == 'algorithm':
+                data[col] = [self.estimators.get(r) for r in range(self.size)]
+            elif col == 'params':
+                data[col] = self.params
+            elif col == 'features':
+                data[col] = [self.features_tuple(m) for m in self.features_masks]
+            elif col == 'confusion_matrix':
+                data[col] = self.confusion_matrices
+            else:
+                data[col] = self.column(col)
+        df = pandas.DataFrame(data, columns=self.columns)
+        df['algorithm_class'] = [self.algo_classes[i] for i in self.column('algo_id')]
+        df['estimator_file'] = [self.spilled.get(r) for r in range(self.size)]
+        df['n_features'] = df['n_features'].astype(int)
+        if sort:
+            #same order of __rank_key: NaN last and the train order between ties
+            df = df.sort_values(by=[self.main_metric, 'predict_time'], ascending=[False,True], kind='stable', na_position='last')
+            df = df.rename_axis('train_order').reset_index()
+        return df
+
+def flushResults(automl_obj, y, result_row):
+    #appending the model to the results log
+    _append_intermediate_steps(_result_row2record(result_row), ['RESULTS', automl_obj.ds_name, y]
+                               , dth=automl_obj.start_time)
 
     #saving the best model
-    df = automl_obj.results[y].copy()
-    df.reset_index(drop=True, inplace=True)
-    best_row = df.iloc[df[automl_obj.main_metric_map[y]].idxmax()]
-    main_metric_value = best_row[automl_obj.main_metric_map[y]]
-    main_metric_value = int(10000*main_metric_value) #to avoid 0 and generate a unique filename
+    main_metric = automl_obj.main_metric_map[y]
     #_flush_intermediate_steps(best_model, ['best_model', automl_obj.ds_name, y]
     #                          , output_type='joblib', dth=automl_obj.start_time, overwrite=True)
 
-    if y not in best_results or best_results[y][automl_obj.main_metric_map[y]] < main_metric_value:
-        best_results[y] = best_row
-        if len(best_results.keys()) == len(automl_obj.y_colname_list):
-            processing_test_datasets()
-        
-        #convert object to string
-        df['algorithm'] = df['algorithm'].astype(str)
-        df['features'] = df['features'].astype(str)
-        df['confusion_matrix'] = df['confusion_matrix'].astype(str)
-        _flush_intermediate_steps(df, ['RESULTS', automl_obj.ds_name, y], output_type='csv')
-    
+    if y not in automl_obj.best_score_map or automl_obj.best_score_map[y] < result_row[main_metric]:
+        automl_obj.best_score_map[y] = result_row[main_metric]
+        #the to_process files are scored again after the GA
+        automl_obj.scoring_pending = True
+
+def best_models(automl_obj):
+    #{y: (best fitted estimator, features)}
+    models = {}
+    for y in automl_obj.y_colname_list:
+        if y not in automl_obj.results:
+            continue
+        row = automl_obj.results[y].best_row()
+        if row is not None:
+            models[y] = (automl_obj.results[y].get_estimator(row)
+                         , automl_obj.results[y].features_tuple(automl_obj.results[y].features_masks[row]))
+    return models
+
+def score_file(file_path, out_path, preprocessing, models, y_encoder_map, predict_proba, chunksize):
+    #streams a file through the preprocessing and the best model of each target, appending the predictions by chunk
+    tmp_path = out_path + '.tmp'
+    n_rows = 0
+    for i, chunk in enumerate(read_ds_chunks(file_path, chunksize)):
+        X = preprocessing.transform(chunk)
+        df_predict = pd.DataFrame(index=range(X.shape[0]))
+        for y, (model, features) in models.items():
+            X_y = preprocessing.take(X, features, dense=not accepts_sparse(model))
+            if predict_proba:
+                df_predict[y] = model.predict_proba(X_y)[:,1]
+            else:
+                y_pred = model.predict(X_y)
+                if y_encoder_map[y] is not None:
+                    y_pred = y_encoder_map[y].inverse_transform(np.asanyarray(y_pred).reshape(-1, 1))[:,0]
+                df_predict[y] = y_pred
+        df_predict.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        n_rows += len(df_predict)
+    os.replace(tmp_path, out_path)
+    return out_path, n_rows
+
+def materialize_results(automl_obj, y):
+    #sorted results table, written once instead of after every model
+    df = automl_obj.results[y].to_dataframe()
+    #convert object to string
+    for col in ['algorithm', 'algorithm_class', 'features', 'confusion_matrix']:
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+    _flush_intermediate_steps(df, ['RESULTS', automl_obj.ds_name, y], dth=automl_obj.start_time, output_type='csv')
+    return df
+
 def features_corr_level_Y(i, X, y, threshold):
+    import scipy.stats as sta
     #features engineering
     #testing correlation between X and Y
     with warnings.catch_warnings():
@@ -138,7 +339,80 @@ def features_corr_level_Y(i, X, y, threshold):
     #else: feature ok with Y
     return i
 
+def columns_block(X, start, end):
+    #dense float64 block of columns from a DataFrame, array or sparse matrix (spearman and mutual_info screening)
+    if isinstance(X, pd.DataFrame):
+        return np.asarray(X.iloc[:, start:end], dtype=np.float64)
+    if sparse.issparse(X):
+        return X[:, start:end].toarray().astype(np.float64)
+    return np.asarray(X[:, start:end], dtype=np.float64)
+
+def take_columns(X, col_idx):
+    if isinstance(X, pd.DataFrame):
+        return X.iloc[:, col_idx]
+    return X[:, col_idx]
+
+def features_corr_Y_scores(X, y, method='pearson', y_is_cat=False, random_state=None):
+    #scores of all the columns of X with y, computed as a single matrix operation
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64).ravel()
+    if method == 'mutual_info':
+        from sklearn.feature_selection import mutual_info_classif, mutual_info_regression
+        if y_is_cat:
+            return mutual_info_classif(X, y, random_state=random_state)
+        return mutual_info_regression(X, y, random_state=random_state)
+    if method == 'spearman':
+        import scipy.stats as sta
+        X = sta.rankdata(X, axis=0)
+        y = sta.rankdata(y)
+    elif method != 'pearson':
+        raise ValueError('Invalid correlation method: ' + str(method))
+    X = X - X.mean(axis=0)
+    y = y - y.mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        #NaN value for correlation because constant feature
+        return (X.T @ y) / (np.sqrt((X*X).sum(axis=0)) * np.sqrt((y*y).sum()))
+
+def sparse_columns_stats(X):
+    #float64 copy of a sparse matrix with its column sums and sums of squares (never densified)
+    X = X.astype(np.float64)
+    col_sum = np.asarray(X.sum(axis=0)).ravel()
+    col_sq_sum = np.asarray(X.multiply(X).sum(axis=0)).ravel()
+    #constant columns: the variance is only the rounding error of the sums
+    var = col_sq_sum - col_sum * col_sum / X.shape[0]
+    var[var <= col_sq_sum * 1e-12] = 0
+    return X, col_sum, var
+
+def sparse_corr_Y_scores(X, y):
+    #pearson correlation of the columns of a sparse X with y: X.T @ (y - mean) over the std of the columns
+    X, _, var = sparse_columns_stats(X)
+    y = np.asarray(y, dtype=np.float64).ravel()
+    y = y - y.mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = (X.T @ y) / (np.sqrt(var) * np.sqrt((y*y).sum()))
+    #NaN value for correlation because constant feature (X.T @ y is a rounding error, not 0)
+    scores[var == 0] = np.nan
+    return scores
+
+def features_corr_level_Y_batch(X, y, threshold, method='pearson', chunk_size=None, y_is_cat=False, random_state=None):
+    #vectorized version of features_corr_level_Y: indexes of the columns of X correlated with y
+    if sparse.issparse(X) and method == 'pearson':
+        #NaN values fail the comparison
+        return np.flatnonzero(np.abs(sparse_corr_Y_scores(X, y)) >= threshold).tolist()
+    n_cols = X.shape[1]
+    if chunk_size is None:
+        #sparse matrices are densified only by chunks
+        chunk_size = 1024 if sparse.issparse(X) else max(n_cols, 1)
+    considered_features = []
+    for start in range(0, n_cols, chunk_size):
+        X_chunk = columns_block(X, start, start+chunk_size)
+        scores = features_corr_Y_scores(X_chunk, y, method, y_is_cat, random_state)
+        #NaN values fail the comparison
+        considered_features.extend((start + np.flatnonzero(np.abs(scores) >= threshold)).tolist())
+    return considered_features
+
 def features_corr_level_X(i, X_0, X_i, threshold):
+    import scipy.stats as sta
     #features engineering
     #testing correlation between X_0 and X_i
     for i in range(0, X_i.shape[1]):
@@ -152,89 +426,381 @@ def features_corr_level_X(i, X_0, X_i, threshold):
     #else: feature ok, no redundance
     return i
 
+def sparse_corr_level_X(X, threshold, block_size=1024):
+    #features_corr_level_X_batch of a sparse X: correlation blocks from the sparse gram matrix X.T @ X
+    #corrected by the column means (only block_size x block_size dense arrays)
+    n_rows, n_cols = X.shape
+    X, col_sum, var = sparse_columns_stats(sparse.csc_matrix(X))
+    mean = col_sum / n_rows
+    constant = var == 0
+    std = np.sqrt(np.where(constant, 1, var))
+    redundant = constant.copy()
+    for start in range(0, n_cols, block_size):
+        end = min(start+block_size, n_cols)
+        X_block_T = X[:, start:end].T.tocsr()
+        for other in range(start, n_cols, block_size):
+            other_end = min(other+block_size, n_cols)
+            cov = (X_block_T @ X[:, other:other_end]).toarray() - np.outer(col_sum[start:end], mean[other:other_end])
+            corr = np.abs(cov / np.outer(std[start:end], std[other:other_end]))
+            #constant columns have zero correlation here (not NaN)
+            corr[constant[start:end], :] = 0
+            corr[:, constant[other:other_end]] = 0
+            if other == start:
+                #only the later columns of the same block
+                corr = np.triu(corr, k=1)
+            redundant[start:end] |= (corr > threshold).any(axis=1)
+    return np.flatnonzero(~redundant).tolist()
+
+def features_corr_level_X_batch(X, threshold, block_size=1024, dtype=np.float32, memmap_dir=None):
+    #vectorized version of features_corr_level_X: a column is removed when it is constant
+    #or when it is correlated (above the threshold) with some later column
+    if sparse.issparse(X):
+        return sparse_corr_level_X(X, threshold, block_size)
+    n_rows, n_cols = X.shape
+    memmap_path = None
+    if memmap_dir is None:
+        Z = np.empty((n_rows, n_cols), dtype=dtype)
+    else:
+        #unique file per call: the targets are screened concurrently on the same directory
+        fd, memmap_path = tempfile.mkstemp(prefix='features_corr_X_', suffix='.dat', dir=memmap_dir)
+        os.close(fd)
+        Z = np.memmap(memmap_path, dtype=dtype, mode='w+', shape=(n_rows, n_cols))
+    
+    try:
+        #standardized columns: the correlation matrix is Z.T @ Z
+        constant = np.zeros(n_cols, dtype=bool)
+        for start in range(0, n_cols, block_size):
+            X_block = columns_block(X, start, start+block_size)
+            X_block = X_block - X_block.mean(axis=0)
+            norm = np.sqrt((X_block*X_block).sum(axis=0))
+            constant[start:start+block_size] = norm == 0
+            norm[norm == 0] = 1
+            Z[:, start:start+block_size] = X_block / norm
+        
+        redundant = constant.copy()
+        for start in range(0, n_cols, block_size):
+            end = min(start+block_size, n_cols)
+            Z_block = Z[:, start:end]
+            for other in range(start, n_cols, block_size):
+                corr = np.abs(Z_block.T @ Z[:, other:other+block_size])
+                if other == start:
+                    #only the later columns of the same block
+                    corr = np.triu(corr, k=1)
+                #constant columns have zero correlation here (not NaN)
+                redundant[start:end] |= (corr > threshold).any(axis=1)
+    finally:
+        if memmap_path is not None:
+            #the views of Z (Z_block) keep the file mapped too
+            Z_block = None
+            del(Z)
+            os.remove(memmap_path)
+    return np.flatnonzero(~redundant).tolist()
+
+def add_stage_time(stage_times, stage, t0):
+    #accumulates the seconds since t0 in stage_times[stage] and returns the start of the next stage
+    t1 = time.perf_counter()
+    stage_times[stage] = stage_times.get(stage, 0) + (t1 - t0)
+    return t1
+
 def float2bigint(float_value):
     if math.isnan(float_value):
         float_value = -1
     return [int(float_value*100000)]
 
+#estimators trained with a dense copy of the selected columns in sparse mode
+#class names: the estimators are not imported to be compared
+DENSE_ONLY_ALGORITHMS = ('GaussianNB', 'QuadraticDiscriminantAnalysis', 'GaussianProcessClassifier'
+                         , 'HistGradientBoostingClassifier')
+
 def is_Voting_or_Stacking(a):
+    from sklearn.ensemble import StackingClassifier, VotingClassifier
     return ((a == VotingClassifier) or (a == StackingClassifier)
             or isinstance(a, VotingClassifier) or isinstance(a, StackingClassifier))
     
-def evaluation(individual, automl_obj, y):
-    #logging.info(individual)
-    algo_instance = individual[-automl_obj.n_bits_algos_map[y]:]
-    # in this point the variable algo_instance is a bitarray
-    algo_instance = bautil.ba2int(bitarray(algo_instance)) % len(automl_obj.selected_algos_map[y])
-    # in this point the variable algo_instance is an integer
-    algo_instance =  automl_obj.selected_algos_map[y][algo_instance]
+def features2mask(features):
+    #integer bitmask of a features bitmap (the first feature is the most significant bit)
+    features = np.asarray(features, dtype=bool)
+    if len(features) == 0:
+        return 0
+    padding = (8 - len(features) % 8) % 8
+    return int.from_bytes(np.packbits(features).tobytes(), 'big') >> padding
+
+class Genome:
+    #GA individual: features bitmap (numpy bool array) + algorithm gene (index in selected_algos_map)
+    def __init__(self, features, algo):
+        self.features = np.array(features, dtype=bool)
+        self.algo = int(algo)
+
+    def __len__(self):
+        return len(self.features) + 1
+
+    def __eq__(self, other):
+        return self.algo == other.algo and np.array_equal(self.features, other.features)
+
+    def __repr__(self):
+        return 'Genome(algo=' + str(self.algo) + ', features=' + str(int(self.features.sum())) + '/' + str(len(self.features)) + ')'
+
+def cx_genome(ind1, ind2):
+    #two-point crossover of the features (as tools.cxTwoPoint) and uniform crossover of the algorithm gene
+    size = len(ind1.features)
+    if size > 1:
+        cxpoint1 = random.randint(1, size)
+        cxpoint2 = random.randint(1, size - 1)
+        if cxpoint2 >= cxpoint1:
+            cxpoint2 += 1
+        else: # Swap the two cx points
+            cxpoint1, cxpoint2 = cxpoint2, cxpoint1
+        ind1.features[cxpoint1:cxpoint2], ind2.features[cxpoint1:cxpoint2] \
+            = ind2.features[cxpoint1:cxpoint2].copy(), ind1.features[cxpoint1:cxpoint2].copy()
+    if random.random() < 0.5:
+        ind1.algo, ind2.algo = ind2.algo, ind1.algo
+    return ind1, ind2
+
+def mut_genome(individual, indpb, algo_indpb, n_algos):
+    #flip bit mutation of the features, the algorithm gene changes to any other algorithm
+    individual.features ^= np.random.random(len(individual.features)) < indpb
+    if n_algos > 1 and random.random() < algo_indpb:
+        individual.algo = random.choice([a for a in range(n_algos) if a != individual.algo])
+    return individual,
+
+def sel_niche_tournament(individuals, k, tournsize):
+    from deap import tools
+    #speciation per algorithm: the tournaments run inside each algorithm niche
+    niches = {}
+    for ind in individuals:
+        niches.setdefault(ind.algo, []).append(ind)
+    chosen = []
+    for niche in niches.values():
+        chosen.extend(tools.selTournament(niche, int(round(k * len(niche) / len(individuals))), tournsize))
+    if len(chosen) < k: #rounding
+        chosen.extend(tools.selTournament(individuals, k - len(chosen), tournsize))
+    return chosen[:k]
+
+def decode_individual(individual, automl_obj, y):
+    algo_instance = automl_obj.selected_algos_map[y][individual.algo]
     # in this point the variable algo_instance is a Class
 
-    if is_Voting_or_Stacking(algo_instance):
-        algo_instance = algo_instance(estimators=[])
+    col_names = automl_obj.getFeaturesNames(y)
+    col_tuple = tuple(col_names[np.flatnonzero(individual.features)])
+    #integer bitmask of the features: fitness cache key
+    features_mask = features2mask(individual.features)
+    return algo_instance, col_tuple, features_mask
+
+def new_algo_instance(algo_class, automl_obj, y):
+    if is_Voting_or_Stacking(algo_class):
+        algo_instance = algo_class(estimators=[])
     else:
-        algo_instance = algo_instance()
+        return algo_class()
     # in this point the variable algo_instance is a object with the default parameters
-    
-    col_tuple = individual[:len(automl_obj.X_bitmap_map[y])-automl_obj.n_bits_algos_map[y]]
-    col_tuple = tuple([automl_obj.X_train_map[y].columns[i] for i, c in enumerate(col_tuple) if c == 1])
-    
-    if len(col_tuple)==0:
-        return float2bigint(-1)
-
-    #seeking for some previous result
-    previous_result = automl_obj.results[y][(automl_obj.results[y]['algorithm'].__class__ == algo_instance.__class__) 
-                                        & (automl_obj.results[y]['features'] == col_tuple)]
-    if previous_result.shape[0]>0:
-        return float2bigint(previous_result.iloc[0][automl_obj.main_metric_map[y]])
-    
-    if is_Voting_or_Stacking(algo_instance):
-        #getting the top 3 best results group by algorithm
-        best_estimators = []
-        automl_obj.results[y].sort_values(by=automl_obj.main_metric_map[y], ascending=False, inplace=True)
-        for row in automl_obj.results[y].iterrows():
-            if len(best_estimators)==3:
-                break
-            
-            if is_Voting_or_Stacking(row[1]['algorithm']):
-                continue
-            
-            candidate_algo = row[1]['algorithm']
-            candidate_algo.set_params(**row[1]['params'])
-            
-            if candidate_algo.__class__ not in [x.__class__ for x in best_estimators]:
-                best_estimators.append(candidate_algo)
+
+    #getting the top 3 best results group by algorithm
+    best_estimators = []
+    for estimator, params in automl_obj.results[y].best_estimators():
+        if len(best_estimators)==3:
+            break
         
-        if len(best_estimators)<2:
-            return float2bigint(-1)
-        #else
-        algo_instance.estimators = list(zip(['e'+str(i) for i in range(1,len(best_estimators)+1)],best_estimators))
+        if is_Voting_or_Stacking(estimator):
+            continue
+        
+        candidate_algo = estimator
+        candidate_algo.set_params(**params)
         
-    X_train2 = automl_obj.X_train_map[y][list(col_tuple)]#._to_pandas()
-    X_test2 = automl_obj.X_test_map[y][list(col_tuple)]#._to_pandas()
+        if candidate_algo.__class__ not in [x.__class__ for x in best_estimators]:
+            best_estimators.append(candidate_algo)
     
-    if len(col_tuple)==1:
+    if len(best_estimators)<2:
+        return None
+    #else
+    algo_instance.estimators = list(zip(['e'+str(i) for i in range(1,len(best_estimators)+1)],best_estimators))
+    return algo_instance
+
+def search_settings(automl_obj, y):
+    #plain values only: the settings are shipped to the GA workers
+    n_jobs = automl_obj.search_n_jobs
+    if automl_obj.ga_backend is not None:
+        n_jobs = 1 #the GA workers already use the cores
+    return {'main_metric': automl_obj.main_metric_map[y]
+            , 'metrics': automl_obj.getMetrics(y)
+            , 'y_is_cat': automl_obj.YisCategorical(y)
+            , 'grid_search': automl_obj.grid_search
+            , 'n_inter_bayessearch': automl_obj.n_inter_bayessearch
+            , 'successive_halving': automl_obj.successive_halving
+            , 'halving_resource': automl_obj.halving_resource
+            , 'halving_factor': automl_obj.halving_factor
+            , 'low_fidelity_frac': automl_obj.low_fidelity_frac
+            , 'low_fidelity_folds': automl_obj.low_fidelity_folds
+            , 'n_folds_cv': automl_obj.n_folds_cv
+            , 'n_jobs': n_jobs
+            , 'random_state': automl_obj.RANDOM_STATE
+            }
+
+#memory mapped data of the workers (per process): file path -> arrays, oldest first
+_worker_data_cache = {}
+WORKER_DATA_CACHE_SIZE = 16
+
+def share_worker_data(automl_obj, y):
+    #serial evaluation reads the maps directly
+    if automl_obj.ga_backend is None:
+        return {'X_train': automl_obj.X_train_map[y], 'y_train': automl_obj.y_train_map[y]
+                , 'X_test': automl_obj.X_test_map[y], 'y_test': automl_obj.y_test_map[y]}
+    #workers get a read only view of the train/test data instead of a copy per individual
+    data = {'X_train': automl_obj.X_train_map[y], 'y_train': automl_obj.y_train_map[y]
+            , 'X_test': automl_obj.X_test_map[y], 'y_test': automl_obj.y_test_map[y]}
+    for k in ['X_train', 'X_test']:
+        if isinstance(data[k], pd.DataFrame):
+            data[k] = data[k].to_numpy()
+    if automl_obj.ga_backend == 'ray':
+        import ray
+        ray_init(automl_obj.n_cores)
+        return ray.put(data)
+    #else: multiprocessing or loky, memory mapped file
+    file_path = os.path.join(automl_obj.shared_data_dir, re.sub('[^A-Za-z0-9]+', '_', y) + '.joblib')
+    dump(data, file_path)
+    return file_path
+
+def release_worker_data(dir_path=None):
+    #drops the cached data of a run directory and of the files already removed
+    #(a mapping keeps the disk space of a deleted file until it is closed)
+    for file_path in list(_worker_data_cache.keys()):
+        if (dir_path is not None and file_path.startswith(dir_path + os.sep)) or not os.path.exists(file_path):
+            del(_worker_data_cache[file_path])
+
+def load_worker_data(data):
+    if isinstance(data, str):
+        if data not in _worker_data_cache:
+            #reused workers (loky executor, user pool) also release the data of the previous runs
+            release_worker_data()
+            while len(_worker_data_cache) >= WORKER_DATA_CACHE_SIZE:
+                del(_worker_data_cache[next(iter(_worker_data_cache))])
+            _worker_data_cache[data] = load(data, mmap_mode='r')
+        return _worker_data_cache[data]
+    if type(data).__name__ == 'ObjectRef': #ray object evaluated in the driver (single task)
+        import ray
+        return ray.get(data)
+    #else: data already in memory (serial evaluation or ray object resolved by the worker)
+    return data
+
+def accepts_sparse(algo_instance):
+    return not (algo_instance.__class__.__name__ in DENSE_ONLY_ALGORITHMS or is_Voting_or_Stacking(algo_instance))
+
+def select_columns(X, col_idx, col_names, dense=False):
+    if isinstance(X, pd.DataFrame):
+        return X.iloc[:, col_idx]
+    if sparse.issparse(X):
+        X = X[:, col_idx]
+        #only the selected columns are densified
+        return X.toarray() if dense else X
+    #else: numpy array (memory mapped)
+    return pd.DataFrame(np.asarray(X[:, col_idx]), columns=col_names)
+
+def halving_resource(algo_instance, search_space, resource, factor):
+    #n_estimators is used as resource only by the ensembles, the others use n_samples
+    #returns resource, min_resources, max_resources and the search space without the resource
+    #(search_space can be a list of spaces: the base space plus the warm start point, see search_space_for)
+    if resource != 'n_estimators' or 'n_estimators' not in algo_instance.get_params():
+        return 'n_samples', 'smallest', 'auto', search_space
+    spaces = [dict(space) for space in (search_space if isinstance(search_space, list) else [search_space])]
+    #the bounds come from the base space: the resource can not be tuned by the search
+    max_resources = max(spaces[0].get('n_estimators', [algo_instance.get_params()['n_estimators']]))
+    for space in spaces:
+        space.pop('n_estimators', None)
+    #min_resources such that the last round (a single candidate left) runs with max_resources
+    if all(isinstance(v, list) for space in spaces for v in space.values()):
+        n_candidates = sum([int(np.prod([len(v) for v in space.values()])) for space in spaces])
+        n_rounds = 1 + int(math.floor(math.log(max(n_candidates, 1), factor)))
+        min_resources = max(1, max_resources // factor**(n_rounds - 1))
+    else: #distributions: unknown number of candidates
+        min_resources = 'smallest'
+    return 'n_estimators', min_resources, max_resources, spaces if isinstance(search_space, list) else spaces[0]
+
+class PeakMemory:
+    #peak RSS (Mb) of the process and its children while the block runs, sampled by a thread
+    #(memory_profiler.memory_usage starts a child process, not allowed in the daemonic pool workers)
+    INTERVAL = 0.05
+
+    def __enter__(self):
+        import psutil
+        self.process = psutil.Process()
+        self.peak = self.__rss()
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self.__sample, daemon=True)
+        self.__thread.start()
+        return self
+
+    def __rss(self):
+        import psutil
+        rss = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error: #finished child
+                pass
+        return rss
+
+    def __sample(self):
+        while not self.__stop.wait(self.INTERVAL):
+            self.peak = max(self.peak, self.__rss())
+
+    def __exit__(self, *exc_info):
+        self.__stop.set()
+        self.__thread.join()
+        self.peak = max(self.peak, self.__rss())
+        self.peak_mb = self.peak / 1024**2
+        return False
+
+def fit_evaluation(algo_instance, col_idx, col_tuple, search_space, settings, data):
+    #runs in the GA workers: it must not touch the AutoML object
+    data = load_worker_data(data)
+    dense = not accepts_sparse(algo_instance)
+    X_train2 = select_columns(data['X_train'], col_idx, col_tuple, dense)
+    X_test2 = select_columns(data['X_test'], col_idx, col_tuple, dense)
+    y_train = data['y_train']
+    y_test = data['y_test']
+    
+    if len(col_tuple)==1 and not sparse.issparse(X_train2):
         X_train2 = np.asanyarray(X_train2).reshape(-1, 1)
         X_test2 = np.asanyarray(X_test2).reshape(-1, 1)
 
-    #tunning parameters
-    with warnings.catch_warnings():
+    #tunning parameters (instrumented: peak memory, wall and cpu time)
+    t0, cpu_t0 = time.perf_counter(), time.process_time()
+    with warnings.catch_warnings(), PeakMemory() as peak_memory:
         warnings.simplefilter("ignore", category=ConvergenceWarning)
-        if automl_obj.grid_search:
+        if settings['grid_search']:
             opt = GridSearchCV(estimator=algo_instance
-                               , param_grid=automl_obj.algorithms[algo_instance.__class__]
-                               , scoring=automl_obj.main_metric_map[y]
-                               , cv=automl_obj.n_folds_cv
-                               , verbose=0, n_jobs=automl_obj.n_jobs
+                               , param_grid=search_space
+                               , scoring=settings['main_metric']
+                               , cv=settings['n_folds_cv']
+                               , verbose=0, n_jobs=settings['n_jobs']
                                )
+        elif settings['successive_halving']:
+            #multi-fidelity: the bad candidates are discarded with a few samples (or estimators)
+            resource, min_resources, max_resources, search_space = halving_resource(algo_instance, search_space
+                                                                                   , settings['halving_resource']
+                                                                                   , settings['halving_factor'])
+            opt = HalvingRandomSearchCV(estimator=algo_instance
+                                        , param_distributions=search_space
+                                        , n_candidates='exhaust'
+                                        , factor=settings['halving_factor']
+                                        , resource=resource, min_resources=min_resources, max_resources=max_resources
+                                        , scoring=settings['main_metric']
+                                        , cv=settings['n_folds_cv']
+                                        , verbose=0, n_jobs=settings['n_jobs'], random_state=settings['random_state']
+                                        )
         else:
+            from skopt import BayesSearchCV
             opt = BayesSearchCV(estimator=algo_instance
-                                , search_spaces=automl_obj.algorithms[algo_instance.__class__]
-                                , scoring=automl_obj.main_metric_map[y]
-                                , n_iter=automl_obj.n_inter_bayessearch, cv=automl_obj.n_folds_cv
-                                , verbose=0, n_jobs=automl_obj.n_jobs, random_state=automl_obj.RANDOM_STATE
+                                , search_spaces=search_space
+                                , scoring=settings['main_metric']
+                                , n_iter=settings['n_inter_bayessearch'], cv=settings['n_folds_cv']
+                                , verbose=0, n_jobs=settings['n_jobs'], random_state=settings['random_state']
                                 )
-        opt.fit(X_train2, automl_obj.y_train_map[y])
+        opt.fit(X_train2, y_train)
+        if (isinstance(opt, HalvingRandomSearchCV) and resource == 'n_estimators'
+            and opt.best_params_['n_estimators'] < max_resources):
+            #the last round stopped below max_resources (rounding): the selected model gets all the estimators
+            opt.best_params_['n_estimators'] = max_resources
+            opt.best_estimator_ = clone(opt.best_estimator_).set_params(n_estimators=max_resources).fit(X_train2, y_train)
+    t1 = time.perf_counter()
 
     result_row = {'algorithm': opt.best_estimator_
             , 'params': opt.best_params_
@@ -242,110 +808,622 @@ def evaluation(individual, automl_obj, y):
             , 'n_features': len(col_tuple)
             , 'train_time': opt.cv_results_['mean_fit_time'][opt.best_index_]
             , 'predict_time': opt.cv_results_['mean_score_time'][opt.best_index_]
+            , 'mem_max': peak_memory.peak_mb
+            , 'search_time': t1 - t0
+            , 'search_cpu_time': time.process_time() - cpu_t0 #this process only (not the n_jobs workers)
             }
 
     if isinstance(result_row['params'], OrderedDict):
         #changing the type to dict (when using BayesSearchCV)
         result_row['params'] = dict(result_row['params'])
 
-    if automl_obj.YisCategorical(y):
+    if settings['y_is_cat']:
         #confusion matrix
         #labels = automl_obj.y_classes_map[y]
         labels = None #TODO: fix this in multi-class case
-        result_row['confusion_matrix'] = confusion_matrix(automl_obj.y_test_map[y], opt.best_estimator_.predict(X_test2), labels=labels)
+        result_row['confusion_matrix'] = confusion_matrix(y_test, opt.best_estimator_.predict(X_test2), labels=labels)
 
     if (is_Voting_or_Stacking(algo_instance)
         and len(algo_instance.estimators)>0):
         #incluing the estimators in the row
         result_row['params'].update({'estimators': opt.best_estimator_.estimators})
 
-    for scor_str in automl_obj.getMetrics(y):
-        result_row[scor_str] = (get_scorer(scor_str)(opt.best_estimator_, X_test2, automl_obj.y_test_map[y]))
-
-    automl_obj.results[y].loc[len(automl_obj.results[y])] = result_row
-
-    log_msg = '*[' + y + '] Model trained:'
+    for scor_str in settings['metrics']:
+        result_row[scor_str] = (get_scorer(scor_str)(opt.best_estimator_, X_test2, y_test))
+    result_row['score_time'] = time.perf_counter() - t1
+
+    return result_row, opt.best_score_
+
+def fit_low_fidelity(algo_instance, col_idx, col_tuple, settings, data):
+    #cheap fitness: default parameters, a subsample and a few folds (runs in the GA workers)
+    data = load_worker_data(data)
+    dense = not accepts_sparse(algo_instance)
+    X_train2 = select_columns(data['X_train'], col_idx, col_tuple, dense)
+    y_train = data['y_train']
+    n_samples = min(X_train2.shape[0], max(int(X_train2.shape[0]*settings['low_fidelity_frac']), 50))
+    X_train2, y_train = utils.resample(X_train2, y_train, replace=False, n_samples=n_samples
+                                       , stratify=y_train if settings['y_is_cat'] else None
+                                       , random_state=settings['random_state'])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        scores = cross_val_score(clone(algo_instance), X_train2, y_train
+                                 , cv=settings['low_fidelity_folds'], scoring=settings['main_metric']
+                                 , n_jobs=settings['n_jobs'], error_score=np.nan)
+    return np.mean(scores)
+
+def budget_plan(n_cores, n_targets, ga_backend):
+    #splits the cores so that targets in parallel x (GA workers or search jobs) <= n_cores
+    #returns n_jobs (preprocessing), targets_n_jobs, search_n_jobs, ga_n_jobs
+    targets_n_jobs = max(1, min(n_targets, n_cores))
+    if ga_backend is None:
+        return n_cores, targets_n_jobs, max(1, n_cores // targets_n_jobs), 1
+    #the GA workers are shared by the targets and the searches run single threaded
+    return n_cores, targets_n_jobs, 1, n_cores
+
+def remaining_time(automl_obj):
+    if automl_obj.time_budget is None:
+        return None
+    return automl_obj.time_budget - (datetime.now() - automl_obj.start_time).total_seconds()
+
+def run_fit_tasks(automl_obj, tasks, func=fit_evaluation):
+    #the tasks not finished before the end of the time budget return None
+    #the running searches are killed at the end of the budget (ray, loky and a pool created by AutoML)
+    #soft limit only for the serial evaluation and a pool given by the user: the running search finishes
+    timeout = remaining_time(automl_obj)
+    if timeout is not None and timeout <= 0:
+        return [None] * len(tasks)
+    if automl_obj.ga_backend is None or len(tasks) <= 1:
+        outputs = []
+        for task in tasks:
+            timeout = remaining_time(automl_obj)
+            outputs.append(func(*task) if timeout is None or timeout > 0 else None)
+        return outputs
+    
+    outputs = [None] * len(tasks)
+    if automl_obj.ga_backend == 'multiprocessing':
+        pool = automl_obj.pool
+        try:
+            async_results = [pool.apply_async(func, task) for task in tasks]
+        except ValueError: #pool terminated by the budget of another target
+            return outputs
+        timed_out = False
+        for i, r in enumerate(async_results):
+            timeout = remaining_time(automl_obj)
+            try:
+                outputs[i] = r.get(timeout=None if timeout is None else max(timeout, 0))
+            except multiprocessing.TimeoutError:
+                timed_out = True
+        if timed_out and automl_obj.created_pool:
+            #budget over for every target: the busy workers are killed (__fit releases the pool)
+            pool.terminate()
+    elif automl_obj.ga_backend == 'loky':
+        executor = get_reusable_executor(max_workers=automl_obj.ga_n_jobs)
+        try:
+            futures = [executor.submit(func, *task) for task in tasks]
+        except RuntimeError: #executor killed by the budget of another target
+            return outputs
+        timed_out = False
+        for i, f in enumerate(futures):
+            timeout = remaining_time(automl_obj)
+            try:
+                outputs[i] = f.result(timeout=None if timeout is None else max(timeout, 0))
+            except concurrent.futures.TimeoutError:
+                timed_out = True
+            except (concurrent.futures.BrokenExecutor, ShutdownExecutorError):
+                pass #executor killed by the budget of another target
+        if timed_out:
+            #budget over for every target: the busy workers are killed (a new executor is created on demand)
+            executor.shutdown(wait=False, kill_workers=True)
+    elif automl_obj.ga_backend == 'ray':
+        import ray
+        remote_fit = ray.remote(func)
+        refs = [remote_fit.remote(*task) for task in tasks]
+        timeout = remaining_time(automl_obj)
+        ready, not_ready = ray.wait(refs, num_returns=len(refs), timeout=None if timeout is None else max(timeout, 0))
+        for ref in not_ready:
+            ray.cancel(ref, force=True)
+        ready = set(ready)
+        for i, ref in enumerate(refs):
+            if ref in ready:
+                outputs[i] = ray.get(ref)
+    else:
+        raise ValueError('Invalid GA backend: ' + str(automl_obj.ga_backend))
+    return outputs
+
+def emit_event(automl_obj, record):
+    #instrumentation events: event_callback and/or json lines log (results/<start>_EVENTS_<ds_name>.jsonl)
+    record['timestamp'] = time.time()
+    if automl_obj.event_callback is not None:
+        automl_obj.event_callback(record)
+    if automl_obj.events_log:
+        _append_intermediate_steps(_result_row2record(record), ['EVENTS', automl_obj.ds_name], dth=automl_obj.start_time)
+
+def algorithm_summary(results_store):
+    #fits, time and memory of each algorithm of a target
+    algo_ids = results_store.column('algo_id')
+    df = pandas.DataFrame({'algorithm': [results_store.algo_classes[i].__name__ for i in algo_ids]})
+    for col in ['search_time', 'search_cpu_time', 'score_time', 'mem_max', results_store.main_metric]:
+        df[col] = results_store.column(col)
+    return df.groupby('algorithm').agg(n_fits=('search_time', 'size')
+                                       , search_time=('search_time', 'sum')
+                                       , search_cpu_time=('search_cpu_time', 'sum')
+                                       , score_time=('score_time', 'sum')
+                                       , mem_max=('mem_max', 'max')
+                                       , best_score=(results_store.main_metric, 'max')
+                                       ).sort_values('best_score', ascending=False)
+
+def register_result(automl_obj, y, result_row, log_label='Model trained'):
+    #the results are merged only by the main process
+    automl_obj.results[y].append(result_row)
+
+    log_msg = '*[' + y + '] ' + log_label + ':'
     log_msg += ' {:.5f}'.format(result_row[automl_obj.main_metric_map[y]]) 
-    log_msg += ' | ' + str(algo_instance)[:str(algo_instance).find('(')] 
-    log_msg += ' | ' + str(len(col_tuple)) + ' features'
+    log_msg += ' | ' + result_row['algorithm'].__class__.__name__
+    log_msg += ' | ' + str(result_row['n_features']) + ' features'
     params_str = str(result_row['params'])
     params_str = params_str.replace("'n_jobs': " + str(automl_obj.n_jobs) + ",","").replace("  ", " ").replace("{ ", "{").replace(" }", "}")
     log_msg += ' | ' + params_str
 
     logging.info(log_msg[:150])#show only the 150 first caracteres
-        
-    flushResults(automl_obj, y)
-    return float2bigint(opt.best_score_) #main metric
 
-def gen_first_people(n_features, n_algos, n_bits_algos):
+    t0 = time.perf_counter()
+    flushResults(automl_obj, y, result_row)
+    flush_time = time.perf_counter() - t0
+    automl_obj.stats_map[y]['flush_time'] += flush_time
+
+    event = {'event': 'evaluation', 'y': y, 'algorithm': result_row['algorithm'].__class__.__name__
+             , 'cached': log_label != 'Model trained', 'flush_time': flush_time}
+    for col in ['n_features', 'train_time', 'predict_time', 'mem_max', 'search_time', 'search_cpu_time', 'score_time'
+                , automl_obj.main_metric_map[y]]:
+        event[col] = result_row.get(col)
+    emit_event(automl_obj, event)
+
+def disk_cache_path(automl_obj, y, algo_class, col_tuple, search_space):
+    if automl_obj.cache_dir is None or is_Voting_or_Stacking(algo_class):
+        return None #voting/stacking estimators depend on the current results
+    settings = search_settings(automl_obj, y)
+    for k in ['n_jobs', 'low_fidelity_frac', 'low_fidelity_folds']:
+        del(settings[k]) #does not change the result
+    key = hash_obj((automl_obj.ds_fingerprint_map[y], y
+                    , algo_class.__module__ + '.' + algo_class.__qualname__
+                    , col_tuple, repr(search_space), settings))
+    return os.path.join(automl_obj.cache_dir, key + '.joblib')
+
+def load_disk_cache(file_path):
+    if file_path is None or not os.path.exists(file_path):
+        return None
+    try:
+        return load(file_path)
+    except Exception:
+        logging.info('Invalid cache file ignored: ' + file_path)
+        return None
+
+def save_disk_cache(file_path, result_row, best_score):
+    if file_path is None:
+        return
+    #atomic write: a killed run never leaves a truncated cache file
+    tmp_path = file_path + '.' + str(os.getpid()) + '.tmp'
+    dump({'result_row': result_row, 'best_score': best_score}, tmp_path)
+    os.replace(tmp_path, file_path)
+
+def low_fidelity_screening(automl_obj, y, tasks, tasks_keys, pending, fitnesses):
+    #two-stage fitness: every individual gets a cheap score, the full tuning runs only
+    #for the ones in the top fraction of all the cheap scores of the run
+    low_fidelity_cache = automl_obj.low_fidelity_cache_map[y]
+    lf_tasks = []
+    lf_keys = []
+    for task, (cache_key, cache_path) in zip(tasks, tasks_keys):
+        if cache_key not in low_fidelity_cache:
+            algo_instance, col_idx, col_tuple, search_space, settings, data = task
+            lf_tasks.append((algo_instance, col_idx, col_tuple, settings, data))
+            lf_keys.append(cache_key)
+    for cache_key, score in zip(lf_keys, run_fit_tasks(automl_obj, lf_tasks, fit_low_fidelity)):
+        if score is None:
+            continue #skipped by the time budget: not cached, screened again in a next generation
+        low_fidelity_cache[cache_key] = score
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore") #all NaN scores
+        threshold = np.nanquantile(list(low_fidelity_cache.values()), 1-automl_obj.full_tuning_top_frac)
+    promoted_tasks = []
+    promoted_keys = []
+    for task, (cache_key, cache_path) in zip(tasks, tasks_keys):
+        if cache_key not in low_fidelity_cache:
+            #skipped by the time budget (same fitness of a skipped full tuning)
+            for i in pending[cache_key]:
+                fitnesses[i] = float2bigint(-1)
+            continue
+        score = low_fidelity_cache[cache_key]
+        if score >= threshold:
+            promoted_tasks.append(task)
+            promoted_keys.append((cache_key, cache_path))
+        else:
+            #not cached in fitness_cache: it can be promoted in a next generation
+            for i in pending[cache_key]:
+                fitnesses[i] = float2bigint(score)
+    logging.info('[' + y + '] Low fidelity screening: ' + str(len(promoted_tasks)) + ' of ' + str(len(tasks)) + ' individuals promoted to full tuning')
+    return promoted_tasks, promoted_keys
+
+def evaluate_individuals(individuals, automl_obj, y):
+    fitnesses = [None] * len(individuals)
+    tasks = []
+    tasks_keys = []
+    settings = search_settings(automl_obj, y)
+    fitness_cache = automl_obj.fitness_cache_map[y]
+    stats = automl_obj.stats_map[y]
+    batch_stats = dict.fromkeys(['memory_cache_hits', 'batch_duplicates', 'disk_cache_hits', 'fits'], 0)
+    t0 = time.perf_counter()
+    pending = {} #repeated genomes in the same batch are trained once
+    for i, individual in enumerate(individuals):
+        algo_class, col_tuple, features_mask = decode_individual(individual, automl_obj, y)
+        if len(col_tuple)==0:
+            fitnesses[i] = float2bigint(-1)
+            continue
+
+        #seeking for some previous result
+        cache_key = (algo_class, features_mask)
+        if cache_key in fitness_cache:
+            fitnesses[i] = fitness_cache[cache_key]
+            batch_stats['memory_cache_hits'] += 1
+            continue
+        if cache_key in pending:
+            pending[cache_key].append(i)
+            batch_stats['batch_duplicates'] += 1
+            continue
+        search_space = search_space_for(automl_obj, y, algo_class, features_mask)
+        cache_path = disk_cache_path(automl_obj, y, algo_class, col_tuple, search_space)
+        cached = load_disk_cache(cache_path)
+        if cached is not None:
+            batch_stats['disk_cache_hits'] += 1
+            register_result(automl_obj, y, cached['result_row'], log_label='Model cached')
+            fitness_cache[cache_key] = float2bigint(cached['best_score'])
+            fitnesses[i] = fitness_cache[cache_key]
+            continue
+
+        algo_instance = new_algo_instance(algo_class, automl_obj, y)
+        if algo_instance is None:
+            fitnesses[i] = float2bigint(-1)
+            continue
+
+        col_idx = [automl_obj.getFeaturesNames(y).get_loc(c) for c in col_tuple]
+        tasks.append((algo_instance, col_idx, col_tuple, search_space
+                      , settings, automl_obj.worker_data_map[y]))
+        tasks_keys.append((cache_key, cache_path))
+        pending[cache_key] = [i]
+
+    if automl_obj.low_fidelity and len(tasks) > 0:
+        tasks, tasks_keys = low_fidelity_screening(automl_obj, y, tasks, tasks_keys, pending, fitnesses)
+
+    batch_stats['fits'] = len(tasks)
+    for (cache_key, cache_path), output in zip(tasks_keys, run_fit_tasks(automl_obj, tasks)):
+        if output is None:
+            #skipped by the time budget: not cached
+            for i in pending[cache_key]:
+                fitnesses[i] = float2bigint(-1)
+            continue
+        result_row, best_score = output
+        save_disk_cache(cache_path, result_row, best_score)
+        register_result(automl_obj, y, result_row)
+        fitness_cache[cache_key] = float2bigint(best_score) #main metric
+        for i in pending[cache_key]:
+            fitnesses[i] = fitness_cache[cache_key]
+
+    for k, v in batch_stats.items():
+        stats[k] += v
+    stats['evaluation_time'] += time.perf_counter() - t0
+    batch_stats.update({'event': 'evaluation_batch', 'y': y, 'individuals': len(individuals)
+                        , 'wall_time': time.perf_counter() - t0})
+    emit_event(automl_obj, batch_stats)
+    return fitnesses
+
+def evaluation(individual, automl_obj, y):
+    return evaluate_individuals([individual], automl_obj, y)[0]
+
+def ga_map(func, individuals, automl_obj, y):
+    #eaSimple evaluates the whole offspring in a single toolbox.map call
+    if getattr(func, 'func', None) is not evaluation:
+        return list(map(func, individuals))
+    return evaluate_individuals(list(individuals), automl_obj, y)
+
+def gen_first_people(n_features, n_algos, seeds=None):
+    #(features bitmap, algorithm gene) of the first individuals: all the features for each algorithm
     first_people = []
-    X_bitmap_map = bautil.int2ba(1, n_features)
-    X_bitmap_map.setall(1)
     for i in range(n_algos):
-        c_bitmap = []
-        c_bitmap.extend(list(X_bitmap_map))
-        c_bitmap.extend(list(bautil.int2ba(i, n_bits_algos)))
-        first_people.append(c_bitmap)
+        first_people.append((np.ones(n_features, dtype=bool), i))
+    #warm start: individuals of a previous run
+    for features, algo in (seeds or []):
+        if not any(algo == a and np.array_equal(features, f) for f, a in first_people):
+            first_people.append((features, algo))
     return first_people
 
+def hall_of_fame_records(automl_obj, y):
+    #top individuals of the run, by column name (see warm_start_from)
+    records = []
+    for individual in automl_obj.hall_of_fame_map[y]:
+        algo_class, col_tuple, features_mask = decode_individual(individual, automl_obj, y)
+        if len(col_tuple) == 0:
+            continue
+        row = automl_obj.results[y].find(algo_class, col_tuple)
+        records.append({'algorithm': algo_class
+                        , 'features': col_tuple
+                        , 'params': None if row is None else automl_obj.results[y].params[row]
+                        , 'score': individual_score(individual)})
+    return records
+
+def warm_start_seeds(automl_obj, y):
+    #previous hall of fame matched by column name against the current features
+    if automl_obj.warm_start_from is None:
+        return []
+    file_path = automl_obj.warm_start_from
+    if isinstance(file_path, dict):
+        if y not in file_path:
+            return []
+        file_path = file_path[y]
+    col_names = automl_obj.getFeaturesNames(y)
+    seeds = []
+    for record in load(file_path):
+        if record['algorithm'] not in automl_obj.selected_algos_map[y]:
+            continue
+        features = np.array([c in record['features'] for c in col_names], dtype=bool)
+        if features.sum() == 0:
+            continue
+        seeds.append((features, automl_obj.selected_algos_map[y].index(record['algorithm'])))
+        if record['params'] is not None and not is_Voting_or_Stacking(record['algorithm']):
+            features_mask = features2mask(features)
+            automl_obj.warm_params_map[y][(record['algorithm'], features_mask)] = record['params']
+    logging.info('[' + y + '] Warm start: ' + str(len(seeds)) + ' individuals from ' + str(file_path))
+    return seeds
+
+def search_space_for(automl_obj, y, algo_class, features_mask):
+    search_space = automl_obj.algorithms[algo_class]
+    params = automl_obj.warm_params_map[y].get((algo_class, features_mask))
+    if params is None:
+        return search_space
+    #the tuned params of the previous run are one more candidate
+    point = {k: [v] for k, v in params.items()}
+    if automl_obj.grid_search or automl_obj.successive_halving:
+        return [search_space, point]
+    return [(search_space, automl_obj.n_inter_bayessearch), (point, 1)]
+
 def ga_toolbox(automl_obj, y):
+    from deap import base, creator, tools
     #genetics algorithm: creating types
     with warnings.catch_warnings(): #TODO: solve RuntimeWarning: A class named 'FitnessMax' has already been created...
         warnings.simplefilter("ignore")
         creator.create("FitnessMax", base.Fitness, weights=(1.0,))
-        creator.create("Individual", list, fitness=creator.FitnessMax)
-    #multiprocessing
+        creator.create("Individual", Genome, fitness=creator.FitnessMax)
+    #multiprocessing: the offspring is evaluated as a batch (see ga_backend)
     toolbox = base.Toolbox()
-    if not(automl_obj.pool is None):
-        #toolbox.register("map", pool.map) #TODO: check if it works
-        pass
+    toolbox.register("map", ga_map, automl_obj=automl_obj, y=y)
 
     #genetics algorithm: initialization
     def initPopulation(pcls, ind_init):
-        return pcls(ind_init(c) for c in gen_first_people(automl_obj.X_train_map[y].shape[1]
+        return pcls(ind_init(features, algo) for features, algo in gen_first_people(automl_obj.X_train_map[y].shape[1]
                                                           , len(automl_obj.selected_algos_map[y])
-                                                          , automl_obj.n_bits_algos_map[y]))
+                                                          , warm_start_seeds(automl_obj, y)))
     toolbox.register("population", initPopulation, list, creator.Individual)
     
     #genetics algorithm: operators
     toolbox.register("evaluate", evaluation, automl_obj=automl_obj, y=y)
-    toolbox.register("mate", tools.cxTwoPoint)
-    toolbox.register("mutate", tools.mutFlipBit, indpb=0.1)
-    toolbox.register("select", tools.selTournament, tournsize=3)
+    toolbox.register("mate", cx_genome)
+    toolbox.register("mutate", mut_genome, indpb=0.1, algo_indpb=automl_obj.ga_algo_mutpb
+                     , n_algos=len(automl_obj.selected_algos_map[y]))
+    if automl_obj.ga_niching:
+        toolbox.register("select", sel_niche_tournament, tournsize=3)
+    else:
+        toolbox.register("select", tools.selTournament, tournsize=3)
     return toolbox
 
+def individual_score(individual):
+    #fitness values are stored by float2bigint
+    return individual.fitness.values[0] / 100000
+
+def ga_statistics():
+    from deap import tools
+    stats = tools.Statistics(individual_score)
+    stats.register("avg", np.mean)
+    stats.register("std", np.std)
+    stats.register("min", np.min)
+    stats.register("max", np.max)
+    return stats
+
+def ga_loop(population, toolbox, cxpb, mutpb, ngen, stats=None, halloffame=None
+            , patience=None, time_budget=None, max_evaluations=None):
+    #algorithms.eaSimple with convergence and budget stop criteria
+    from deap import algorithms, tools
+    t0 = time.perf_counter()
+    logbook = tools.Logbook()
+    logbook.header = ['gen', 'nevals'] + (stats.fields if stats is not None else [])
+    n_evaluations = 0
+    best_score = None
+    stagnation = 0
+    stop_reason = 'ngen'
+    for gen in range(0, ngen+1):
+        if gen == 0:
+            offspring = population
+        else:
+            offspring = toolbox.select(population, len(population))
+            offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+        
+        #evaluate the individuals with an invalid fitness
+        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+        for ind, fit in zip(invalid_ind, fitnesses):
+            ind.fitness.values = fit
+        n_evaluations += len(invalid_ind)
+        
+        if halloffame is not None:
+            halloffame.update(offspring)
+        population[:] = offspring
+        
+        record = stats.compile(population) if stats is not None else {}
+        logbook.record(gen=gen, nevals=len(invalid_ind), **record)
+        
+        #stop criteria
+        gen_best_score = max([individual_score(ind) for ind in population])
+        if best_score is None or gen_best_score > best_score:
+            best_score = gen_best_score
+            stagnation = 0
+        else:
+            stagnation += 1
+        if patience is not None and stagnation >= patience:
+            stop_reason = 'stagnation'
+            break
+        if time_budget is not None and time.perf_counter() - t0 >= time_budget:
+            stop_reason = 'time_budget'
+            break
+        if max_evaluations is not None and n_evaluations >= max_evaluations:
+            stop_reason = 'evaluation_budget'
+            break
+    return population, logbook, stop_reason
+
 # source: https://www.kaggle.com/ratan123/m5-forecasting-lightgbm-with-timeseries-splits
 
-def reduce_mem_usage(df, verbose=True):
-    numerics = ['int16', 'int32', 'int64', 'float16', 'float32', 'float64']
-    start_mem = df.memory_usage(deep=True).sum() / 1024**2
-    logging.info('Original memory usage {:5.2f} Mb'.format(start_mem))
-    for col in df.columns:
-        col_type = df[col].dtypes
-        if col_type in numerics:
-            c_min = df[col].min()
-            c_max = df[col].max()
-            if str(col_type)[:3] == 'int':
-                if c_min > np.iinfo(np.int8).min and c_max < np.iinfo(np.int8).max:
-                    df[col] = df[col].astype(np.int8)
-                elif c_min > np.iinfo(np.int16).min and c_max < np.iinfo(np.int16).max:
-                    df[col] = df[col].astype(np.int16)
-                elif c_min > np.iinfo(np.int32).min and c_max < np.iinfo(np.int32).max:
-                    df[col] = df[col].astype(np.int32)
-                elif c_min > np.iinfo(np.int64).min and c_max < np.iinfo(np.int64).max:
-                    df[col] = df[col].astype(np.int64)  
+def compact_dtype(col_type, c_min, c_max, float_floor=np.float32):
+    #smallest dtype of the same kind that holds the [c_min, c_max] range
+    #floats are never downcasted below float_floor (float16 loses precision before the normalization)
+    if str(col_type)[:3] in ['int', 'uin']:
+        for int_type in [np.int8, np.int16, np.int32]:
+            if c_min > np.iinfo(int_type).min and c_max < np.iinfo(int_type).max:
+                return int_type
+        return np.int64 if str(col_type) != 'uint64' else np.uint64
+    for float_type in [np.float16, np.float32]:
+        if np.dtype(float_type).itemsize < np.dtype(float_floor).itemsize:
+            continue
+        if c_min > np.finfo(float_type).min and c_max < np.finfo(float_type).max:
+            return float_type
+    return np.float64
+
+def is_object_or_category(col_type):
+    return col_type == object or str(col_type) == 'category'
+
+def optimize_dtypes(df, float_floor=np.float32, category_limit=0, verbose=True):
+    #compacts the numeric columns (min/max of all the columns in one pass) and converts the object
+    #columns with at most category_limit distinct values to category
+    #returns the optimized DataFrame and the memory report per column
+    single_col = isinstance(df, pd.Series)
+    if single_col:
+        df = df.to_frame()
+    start_mem = df.memory_usage(deep=True, index=False)
+    dtypes_before = df.dtypes
+    new_dtypes = {}
+    num_cols = df.select_dtypes(include=[np.number]).columns
+    if len(num_cols) > 0:
+        stats = df[num_cols].agg(['min', 'max'])
+        for col in num_cols:
+            if stats[col].isna().any(): #all values are NaN
+                continue
+            new_dtypes[col] = compact_dtype(df[col].dtypes, stats.at['min', col], stats.at['max', col], float_floor)
+    if category_limit > 0:
+        obj_cols = df.select_dtypes(include=[object]).columns
+        if len(obj_cols) > 0:
+            n_unique = df[obj_cols].nunique()
+            for col in n_unique[n_unique <= category_limit].index:
+                new_dtypes[col] = 'category'
+    new_dtypes = {col: t for col, t in new_dtypes.items() if str(np.dtype(t) if t != 'category' else t) != str(df[col].dtypes)}
+    if len(new_dtypes) > 0:
+        df = df.astype(new_dtypes)
+    end_mem = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'dtype_before': dtypes_before.astype(str), 'dtype_after': df.dtypes.astype(str)
+                           , 'mem_before': start_mem, 'mem_after': end_mem, 'mem_saved': start_mem - end_mem})
+    if verbose:
+        logging.info('Mem. usage decreased from {:5.2f} Mb to {:5.2f} Mb ({:.1f}% reduction)'.format(
+            start_mem.sum() / 1024**2, end_mem.sum() / 1024**2, 100 * (start_mem.sum() - end_mem.sum()) / max(start_mem.sum(), 1)))
+        for col, row in report[report['mem_saved'] > 0].iterrows():
+            logging.info('   ' + str(col) + ': ' + row['dtype_before'] + ' -> ' + row['dtype_after']
+                         + ' | {:.2f} Kb saved'.format(row['mem_saved'] / 1024))
+    if single_col:
+        df = df.iloc[:, 0]
+    return df, report
+
+def reduce_mem_usage(df, verbose=True, float_floor=np.float32):
+    return optimize_dtypes(df, float_floor=float_floor, verbose=verbose)[0]
+
+def read_ds_chunks(ds_source, chunksize, header='infer', names=None, dtype=None):
+    #iterates over a CSV or Parquet (.gzip) source without loading it entirely
+    if ds_source.endswith('.csv'):
+        for chunk in pd.read_csv(ds_source, header=header, names=names, chunksize=chunksize, dtype=dtype):
+            yield chunk
+    elif ds_source.endswith('.gzip'):
+        from fastparquet import ParquetFile
+        for row_group in ParquetFile(ds_source).iter_row_groups():
+            if dtype is not None:
+                row_group = row_group.astype(dtype)
+            for start in range(0, len(row_group), chunksize):
+                yield row_group.iloc[start:start+chunksize]
+
+def ds_source_profile(chunks, unique_categoric_limit, float_floor=np.float32):
+    #first pass: number of rows, compact dtypes (full range) and the categories of the object columns
+    #object columns with more than unique_categoric_limit values get None categories (text columns)
+    #'mixed': columns with numeric and text chunks, to be profiled again read as str (see read_dtypes)
+    n_rows = 0
+    kinds, c_min, c_max, categories, has_nan = {}, {}, {}, {}, {}
+    mixed = set()
+    for chunk in chunks:
+        n_rows += len(chunk)
+        num_cols = chunk.select_dtypes(include=[np.number]).columns
+        if len(num_cols) > 0:
+            chunk_min = chunk[num_cols].min()
+            chunk_max = chunk[num_cols].max()
+        for col in chunk.columns:
+            if chunk[col].isna().all():
+                #all NaN chunk (read as float64): it says nothing about the kind of the column
+                has_nan[col] = True
+                kinds.setdefault(col, None)
+            elif col in mixed:
+                continue
+            elif (col in num_cols and kinds.get(col) == 'object') or (chunk[col].dtypes == object and kinds.get(col) == 'num'):
+                #the numbers of a text column are text in a single read of the source
+                mixed.add(col)
+            elif col in num_cols and kinds.get(col) in [None, 'num']:
+                kinds[col] = 'num'
+                c_min[col] = np.nanmin([c_min.get(col, np.nan), chunk_min[col]])
+                c_max[col] = np.nanmax([c_max.get(col, np.nan), chunk_max[col]])
+                if str(chunk[col].dtypes)[:3] != 'int':
+                    categories[col] = 'float'
+            elif chunk[col].dtypes == object:
+                kinds[col] = 'object'
+                if col in categories and type(categories[col]) != set:
+                    categories[col] = None #mixed numeric and text values
+                if categories.get(col, set()) is not None:
+                    values = chunk[col]
+                    has_nan[col] = has_nan.get(col, False) or values.isna().any()
+                    categories[col] = categories.get(col, set()).union(values.dropna().unique())
+                    if len(categories[col]) + has_nan[col] > unique_categoric_limit:
+                        categories[col] = None
             else:
-                if c_min > np.finfo(np.float16).min and c_max < np.finfo(np.float16).max:
-                    df[col] = df[col].astype(np.float16)
-                elif c_min > np.finfo(np.float32).min and c_max < np.finfo(np.float32).max:
-                    df[col] = df[col].astype(np.float32)
-                else:
-                    df[col] = df[col].astype(np.float64)    
-    end_mem = df.memory_usage(deep=True).sum() / 1024**2
-    if verbose: 
-        logging.info('Mem. usage decreased to {:5.2f} Mb ({:.1f}% reduction)'.format(
-            end_mem, 100 * (start_mem - end_mem) / start_mem))
-    return df
+                kinds[col] = 'other'
+    profile = {'n_rows': n_rows, 'dtypes': {}, 'categories': {}, 'min': c_min, 'max': c_max, 'mixed': sorted(mixed)}
+    for col, kind in kinds.items():
+        if col in mixed:
+            profile['dtypes'][col] = object
+            c_min.pop(col, None)
+            c_max.pop(col, None)
+        elif kind is None: #only NaN values
+            profile['dtypes'][col] = float_floor
+        elif kind == 'num':
+            col_type = 'float' if categories.get(col) == 'float' or has_nan.get(col, False) else 'int'
+            profile['dtypes'][col] = compact_dtype(col_type, c_min[col], c_max[col], float_floor)
+        elif kind == 'object':
+            profile['dtypes'][col] = object
+            if categories.get(col) is not None and len(categories[col]) + has_nan[col] > unique_categoric_limit:
+                categories[col] = None #the NaN of the all NaN chunks
+            if categories.get(col) is not None:
+                profile['categories'][col] = sorted(categories[col], key=str) + ([np.nan] if has_nan[col] else [])
+                profile['dtypes'][col] = pd.CategoricalDtype(sorted(categories[col], key=str))
+    return profile
+
+def read_ds_sample(ds_source, chunksize, header, names, profile, sample_frac, drop_nan_values, random_state):
+    #second pass: the chunks are casted to the profile dtypes and sampled while reading
+    sample_list = []
+    for i, chunk in enumerate(read_ds_chunks(ds_source, chunksize, header, names, dtype=profile.get('read_dtypes'))):
+        if drop_nan_values:
+            chunk = chunk.dropna()
+        chunk = chunk.astype(profile['dtypes'])
+        if sample_frac < 1:
+            chunk = chunk.sample(frac=sample_frac, random_state=random_state + i)
+        sample_list.append(chunk)
+    return pd.concat(sample_list, ignore_index=True)
 
 def optimize_pandas():
 #souce: https://realpython.com/python-pandas-tricks/
@@ -368,10 +1446,13 @@ def optimize_pandas():
         for op, value in option.items():
             pd.set_option(f'{category}.{op}', value)  # Python 3.6+
 
-def ray_init():
-    ray.init(ignore_reinit_error=True, _redis_password="password")
+def ray_init(num_cpus=None):
+    import ray
+    ray.init(ignore_reinit_error=True, num_cpus=num_cpus, _redis_password="password")
 
 def parallel_process_y(automlobj, y):
+    t0 = time.perf_counter()
+    stage_times = {}
     y_encoder = None
     y_full = automlobj.y_full[y]
     y_classes = None
@@ -380,12 +1461,12 @@ def parallel_process_y(automlobj, y):
     if automlobj.YisCategorical(y):
         logging.info('[' + y + '] ML problem type: Classification')
         stratify = y_full
-        y_classes = np.sort(automlobj.y_full[y].unique())
-        if y_full.dtype == 'object':
+        y_classes = np.sort(np.asarray(automlobj.y_full[y].unique()))
+        if is_object_or_category(y_full.dtype):
             #encoding
             y_encoder = OrdinalEncoder(dtype=int)
             y_full = pd.DataFrame(y_encoder.fit_transform(np.asanyarray(automlobj.y_full[y]).reshape(-1, 1)), columns=[y])
-            y_full = reduce_mem_usage(y_full, verbose=False)
+            y_full = reduce_mem_usage(y_full, verbose=False, float_floor=automlobj.dtype_float_floor)
     else:
         logging.info('[' + y + '] ML problem type: Regression')
 
@@ -396,20 +1477,21 @@ def parallel_process_y(automlobj, y):
     logging.info('[' + y + ']   y_train dimensions: ' + str(y_train.shape))
     y_train = np.asanyarray(y_train).reshape(-1, 1).ravel()
     y_test = np.asanyarray(y_test).reshape(-1, 1).ravel()
+    t0 = add_stage_time(stage_times, 'split', t0)
+
+    col_names = automlobj.getXColumns()
 
     #running feature engineering in parallel
     if automlobj.features_engineering:
-        n_cols = X_train.shape[1]
         logging.info('[' + y + '] Features engineering - Testing correlation with Y...')
-        considered_features = Parallel(n_jobs=automlobj.n_jobs, backend="threading")(delayed(features_corr_level_Y)
-                                (j
-                                , X_train.iloc[:,j]#._to_pandas()
-                                , y_train
-                                , automlobj.min_x_y_correlation_rate)
-                                for j in range(0, n_cols))
-        considered_features = [x for x in considered_features if x is not None]
-        X_train = X_train.iloc[:,considered_features]
-        X_test = X_test.iloc[:,considered_features]
+        considered_features = features_corr_level_Y_batch(X_train, y_train, automlobj.min_x_y_correlation_rate
+                                                          , method=automlobj.corr_method
+                                                          , chunk_size=automlobj.corr_chunk_size
+                                                          , y_is_cat=automlobj.YisCategorical(y)
+                                                          , random_state=automlobj.RANDOM_STATE)
+        X_train = take_columns(X_train, considered_features)
+        X_test = take_columns(X_test, considered_features)
+        col_names = col_names[considered_features]
         
         def n_features_2str():
             return "{:.2f}".format(100*(1-len(considered_features)/automlobj.X.shape[1])) + "% (" + str(len(considered_features)) + " remained)"
@@ -419,31 +1501,28 @@ def parallel_process_y(automlobj, y):
         if automlobj.do_redundance_test_X:
             logging.info('[' + y + '] Features engineering - Testing redudance between features...')    
             
-            n_cols = X_train.shape[1]
-            considered_features = Parallel(n_jobs=automlobj.n_jobs, backend="threading")(delayed(features_corr_level_X)
-                                    (j
-                                    , X_train.iloc[:,j]#._to_pandas()
-                                    , X_train.iloc[:,j+1:]#._to_pandas()
-                                    , (1-automlobj.min_x_y_correlation_rate))
-                                    for j in range(0, n_cols-1))
-
-            considered_features = [x for x in considered_features if x is not None]
-            X_train = X_train.iloc[:,considered_features]
-            X_test = X_test.iloc[:,considered_features]
+            considered_features = features_corr_level_X_batch(X_train, (1-automlobj.min_x_y_correlation_rate)
+                                                              , block_size=automlobj.corr_block_size
+                                                              , memmap_dir=automlobj.corr_memmap_dir)
+            X_train = take_columns(X_train, considered_features)
+            X_test = take_columns(X_test, considered_features)
+            col_names = col_names[considered_features]
             
             logging.info('[' + y + ']   Features engineering - Features reduction after redudance test: ' + n_features_2str())
-    
+    add_stage_time(stage_times, 'screen', t0)
+
     if automlobj.flush_intermediate_steps:
-        col_names = list(X_train.columns)
-        trans_df = pandas.DataFrame(columns=col_names)
+        trans_df = pandas.DataFrame(columns=list(col_names))
         _flush_intermediate_steps(trans_df, label_list=[automlobj.ds_name, 'AFTER_FEATENG', y]
                                     , output_type='csv')            
-    return (y, list(X_train.columns), y_encoder, y_full
-            , y_classes, X_train, X_test, y_train, y_test)
+    return (y, list(col_names), y_encoder, y_full
+            , y_classes, X_train, X_test, y_train, y_test, stage_times)
 
 def parallel_process_fit(y, metrics, y_is_cat):
-    #dataframe format: ['algorithm', 'params', 'features', 'n_features', 'train_time', 'predict_time', 'mem_max', <metrics>]
-    columns_list_base = ['algorithm', 'params', 'features', 'n_features', 'train_time', 'predict_time', 'mem_max']
+    #dataframe format: ['algorithm', 'params', 'features', 'n_features', 'train_time', 'predict_time', 'mem_max'
+    #                    , 'search_time', 'search_cpu_time', 'score_time', <metrics>]
+    columns_list_base = ['algorithm', 'params', 'features', 'n_features', 'train_time', 'predict_time', 'mem_max'
+                         , 'search_time', 'search_cpu_time', 'score_time']
     columns_list_base.extend(metrics)
     if y_is_cat:
         columns_list_base.append('confusion_matrix')
@@ -451,11 +1530,19 @@ def parallel_process_fit(y, metrics, y_is_cat):
     map_columns_list = {}
     map_columns_list[y] = columns_list_base
     
-    results_df = pandas.DataFrame(columns=columns_list_base)
-    
-    return (y, map_columns_list, results_df)
+    return (y, map_columns_list)
+
+def tfidf_feature_names(col_name, vectorizer):
+    return [col_name + '_' + name for name in vectorizer.get_feature_names_out()]
+
+def onehot_feature_names(onehot_encoder):
+    hot_cols_names = []
+    for i, name in enumerate(onehot_encoder.feature_names_in_):
+        for cat in onehot_encoder.categories_[i]:
+            hot_cols_names.append(name + '_' + str(cat).lower().replace(' ','_'))
+    return hot_cols_names
 
-def parallel_tfidf(col_name, X_i):
+def parallel_tfidf(col_name, X_i, sparse_output=False):
     X_i = preprocess_text(X_i)
     my_stop_words = text.ENGLISH_STOP_WORDS#.union(["book"])
     vectorizer = TfidfVectorizer(ngram_range=(1,4), max_features=750
@@ -464,6 +1551,8 @@ def parallel_tfidf(col_name, X_i):
                                 , max_df=0.9, min_df=0.01)
     
     X_tfidf = vectorizer.fit_transform(X_i)
+    if sparse_output:
+        return (col_name, X_tfidf.astype(np.float32), vectorizer)
     
     X_tfidf = pd.DataFrame(X_tfidf.toarray())
     X_tfidf.columns = vectorizer.get_feature_names_out(X_tfidf.columns)
@@ -471,7 +1560,365 @@ def parallel_tfidf(col_name, X_i):
     
     return (col_name, X_tfidf, vectorizer)
 
+class PreprocessingPipeline:
+    #fitted transformations of X: tfidf (text columns), one hot (categoric columns), imputation and normalization
+    #transform/transform_iter reproduce the training features for new data (optionally only the columns of a target)
+    def __init__(self, hot_columns, str_columns, onehot_categories='auto', drop_nan_values=False
+                 , sparse_output=False, float_floor=np.float32, chunksize=None, source_range=None
+                 , n_jobs=1, random_state=None):
+        self.hot_columns = list(hot_columns)
+        self.str_columns = list(str_columns)
+        self.num_columns = []
+        self.drop_nan_values = drop_nan_values
+        self.sparse_output = sparse_output
+        self.float_floor = float_floor
+        #incremental scaler fit: rows per chunk and the {column: (min, max)} of the full source
+        self.chunksize = chunksize
+        self.source_range = source_range
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.tfidf_vectorizers_map = {}
+        self.onehot_encoder = OneHotEncoder(sparse=sparse_output, dtype=int, categories=onehot_categories)
+        self.hot_cols_names = []
+        self.iterative_imputer = None
+        self.scaler = None
+        self.X_columns = None
+        self.dtypes = None
+        #selected features of each target
+        self.columns_map = {}
+        #fit seconds: 'encode' (tfidf and one hot), 'impute' and 'scale'
+        self.stage_times = {}
+
+    def __fit_imputer(self, X):
+        #without NaN values in the training data only the initial (mean) imputation is fitted
+        self.iterative_imputer = IterativeImputer(random_state=self.random_state)
+        if sum(pd.DataFrame(X).isna().sum()) > 0: #there are nan values
+            return pd.DataFrame(self.iterative_imputer.fit_transform(X), columns=X.columns)
+        self.iterative_imputer.set_params(skip_complete=True).fit(X)
+        return X
+
+    def __fit_scaler(self, X):
+        self.scaler = preprocessing.MinMaxScaler()
+        if self.chunksize is None:
+            return self.scaler.fit_transform(X)
+        #incremental fit by chunks plus the range of the numeric columns in the full source
+        X = pd.DataFrame(X, columns=self.num_columns if self.sparse_output else None)
+        for start in range(0, X.shape[0], self.chunksize):
+            self.scaler.partial_fit(X.iloc[start:start+self.chunksize])
+        if self.source_range is not None:
+            source_range = pd.DataFrame([self.scaler.data_min_, self.scaler.data_max_], columns=X.columns)
+            for col in source_range.columns:
+                if col in self.source_range:
+                    source_range[col] = list(self.source_range[col])
+            self.scaler.partial_fit(source_range)
+        return self.scaler.transform(X)
+
+    def fit_transform(self, X):
+        t0 = time.perf_counter()
+        self.num_columns = [c for c in X.columns if c not in self.str_columns and c not in self.hot_columns]
+        if len(self.str_columns) > 0:
+            #do tfidf
+            result_list = Parallel(n_jobs=self.n_jobs, backend='multiprocessing')(delayed(parallel_tfidf) 
+                                    (col_name, X[col_name], self.sparse_output)
+                                    for col_name in self.str_columns)
+            for result in result_list:
+                self.tfidf_vectorizers_map[result[0]] = result[2]
+            t0 = add_stage_time(self.stage_times, 'encode', t0)
+
+        if self.sparse_output:
+            #sparse mode: numeric, tfidf and one hot blocks stacked in a CSR matrix (never densified)
+            blocks = []
+            if len(self.num_columns) > 0:
+                X_num = X[self.num_columns]
+                if not self.drop_nan_values:
+                    #inpuiting values for X NaN values
+                    X_num = self.__fit_imputer(X_num)
+                    t0 = add_stage_time(self.stage_times, 'impute', t0)
+                #normalizing the numeric variables (tfidf and one hot are already in [0, 1])
+                logging.info('Normalizing the variables...')
+                blocks.append(sparse.csr_matrix(self.__fit_scaler(X_num), dtype=np.float32))
+                t0 = add_stage_time(self.stage_times, 'scale', t0)
+            for result in result_list if len(self.str_columns) > 0 else []:
+                blocks.append(result[1])
+            if len(self.hot_columns) > 0:
+                logging.info('One hot encoder columns: ' +str(self.hot_columns))
+                blocks.append(self.onehot_encoder.fit_transform(X[self.hot_columns]).astype(np.float32))
+                self.hot_cols_names = onehot_feature_names(self.onehot_encoder)
+            X = sparse.hstack(blocks, format='csr', dtype=np.float32)
+            self.X_columns = pd.Index(self.num_columns + self.__tfidf_cols_names() + self.hot_cols_names)
+            add_stage_time(self.stage_times, 'encode', t0)
+            logging.info('Sparse X dimensions: ' + str(X.shape) + ' | non zero values: ' + str(X.nnz))
+            return X
+
+        blocks = [X[self.num_columns].reset_index(drop=True)]
+        if len(self.str_columns) > 0:
+            blocks.extend([result[1] for result in result_list])
+            logging.info('X dimensions after Tfidf: ' + str((X.shape[0], sum([b.shape[1] for b in blocks]) + len(self.hot_columns))))
+        if len(self.hot_columns) > 0:
+            logging.info('One hot encoder columns: ' +str(self.hot_columns))
+            self.onehot_encoder.fit(X[self.hot_columns])
+            self.hot_cols_names = onehot_feature_names(self.onehot_encoder)
+            blocks.append(pd.DataFrame(self.onehot_encoder.transform(X[self.hot_columns]), columns=self.hot_cols_names))
+        X = pd.concat(blocks, axis=1)
+        del(blocks)
+        if len(self.hot_columns) > 0:
+            logging.info('X dimensions after One hot encoder: ' + str(X.shape))
+        t0 = add_stage_time(self.stage_times, 'encode', t0)
+
+        if not self.drop_nan_values:
+            #inpuiting values for X NaN values
+            X = pd.DataFrame(self.__fit_imputer(X), columns=X.columns)
+            t0 = add_stage_time(self.stage_times, 'impute', t0)
+
+        #normalizing the variables
+        logging.info('Normalizing the variables...')
+        X = pd.DataFrame(self.__fit_scaler(X), columns=X.columns)
+
+        logging.info('Optimizing the dataset X after Normalization:')
+        X = reduce_mem_usage(X, float_floor=self.float_floor)
+        add_stage_time(self.stage_times, 'scale', t0)
+        self.X_columns = X.columns
+        self.dtypes = X.dtypes
+        return X
+
+    def __tfidf_cols_names(self):
+        cols_names = []
+        for col_name in self.str_columns:
+            cols_names.extend(tfidf_feature_names(col_name, self.tfidf_vectorizers_map[col_name]))
+        return cols_names
+
+    def take(self, X, columns, dense=False):
+        if self.sparse_output:
+            X = take_columns(X, self.X_columns.get_indexer(list(columns)))
+            return X.toarray() if dense else X
+        return X[list(columns)]
+
+    def select_columns(self, X, y):
+        #features selected for the target y
+        return self.take(X, self.columns_map[y])
+
+    def transform(self, df, y=None):
+        #df: rows with the source columns (other columns, as the targets, are ignored)
+        if self.drop_nan_values:
+            df = df.dropna(subset=self.num_columns + self.str_columns + self.hot_columns)
+        X_num = df[self.num_columns].reset_index(drop=True)
+        if self.sparse_output and self.iterative_imputer is not None and sum(X_num.isna().sum()) > 0:
+            X_num = pd.DataFrame(self.iterative_imputer.transform(X_num), columns=self.num_columns)
+        X_tfidf_list = []
+        for col_name in self.str_columns:
+            vectorizer = self.tfidf_vectorizers_map[col_name]
+            X_tfidf_list.append(vectorizer.transform(preprocess_text(df[col_name], n_jobs=self.n_jobs)).astype(np.float32))
+        
+        if self.sparse_output:
+            blocks = []
+            if len(self.num_columns) > 0:
+                blocks.append(sparse.csr_matrix(self.scaler.transform(X_num), dtype=np.float32))
+            blocks.extend(X_tfidf_list)
+            if len(self.hot_columns) > 0:
+                blocks.append(self.onehot_encoder.transform(df[self.hot_columns]).astype(np.float32))
+            X = sparse.hstack(blocks, format='csr', dtype=np.float32)
+        else:
+            blocks = [X_num]
+            for col_name, X_tfidf in zip(self.str_columns, X_tfidf_list):
+                blocks.append(pd.DataFrame(X_tfidf.toarray()
+                                           , columns=tfidf_feature_names(col_name, self.tfidf_vectorizers_map[col_name])))
+            if len(self.hot_columns) > 0:
+                blocks.append(pd.DataFrame(self.onehot_encoder.transform(df[self.hot_columns]), columns=self.hot_cols_names))
+            X = pd.concat(blocks, axis=1)
+            if self.iterative_imputer is not None and sum(X.isna().sum()) > 0:
+                X = pd.DataFrame(self.iterative_imputer.transform(X), columns=self.X_columns)
+            X = pd.DataFrame(self.scaler.transform(X), columns=self.X_columns).astype(self.dtypes)
+        
+        if y is not None:
+            X = self.select_columns(X, y)
+        return X
+
+    def transform_iter(self, chunks, y=None):
+        #chunked transform: chunks is an iterable of DataFrames (e.g. read_ds_chunks of a large file)
+        for chunk in chunks:
+            yield self.transform(chunk, y)
+
+def strip_feature_names(estimator):
+    #the Predictor feeds numpy arrays in the training columns order: no feature names validation per call
+    if 'feature_names_in_' in vars(estimator):
+        del(estimator.feature_names_in_)
+    if hasattr(estimator, 'get_booster'): #xgboost
+        estimator.get_booster().feature_names = None
+    for value in vars(estimator).values():
+        for sub_estimator in (value if type(value) in [list, tuple] else [value]):
+            if isinstance(sub_estimator, tuple) and len(sub_estimator) == 2: #(name, estimator)
+                sub_estimator = sub_estimator[1]
+            if hasattr(sub_estimator, 'get_params') and hasattr(sub_estimator, '__dict__'):
+                strip_feature_names(sub_estimator)
+    return estimator
+
+class Predictor:
+    #exported best models: preprocessing, selected features, fitted estimator and y decoding of each target
+    #predict/predict_proba fill preallocated numpy buffers straight from the records (no DataFrame per call)
+    #batches with missing numeric values go through the full PreprocessingPipeline (iterative imputation)
+    NAN_KEY = '__nan__'
+
+    def __init__(self, preprocessing, models, y_encoder_map, max_batch_size=64):
+        self.preprocessing = preprocessing
+        self.targets = list(models.keys())
+        self.models = {y: strip_feature_names(copy.deepcopy(model)) for y, (model, _) in models.items()}
+        self.features_map = {y: list(features) for y, (_, features) in models.items()}
+        self.classes_map = {y: (None if y_encoder_map.get(y) is None else y_encoder_map[y].categories_[0])
+                            for y in self.targets}
+        self.__compile()
+        self.__alloc(max_batch_size)
+
+    def __compile(self):
+        #union of the features used by the models: source column of each one and its scaling
+        pp = self.preprocessing
+        self.feature_names = []
+        for y in self.targets:
+            self.feature_names.extend([f for f in self.features_map[y] if f not in self.feature_names])
+        feature_index = {f: j for j, f in enumerate(self.feature_names)}
+        self.target_index = {y: np.array([feature_index[f] for f in self.features_map[y]], dtype=np.intp)
+                             for y in self.targets}
+        n = len(self.feature_names)
+        self.scale = np.ones(n)
+        self.offset = np.zeros(n)
+        self.num_items = [] #(source column, feature index)
+        self.hot_items = {} #source column -> {category: feature index}
+        self.text_items = {} #source column -> (vocabulary indexes, feature indexes)
+        hot_features = {}
+        for i, col in enumerate(pp.hot_columns):
+            for cat in pp.onehot_encoder.categories_[i]:
+                key = self.NAN_KEY if (type(cat) == float and np.isnan(cat)) else cat
+                hot_features[col + '_' + str(cat).lower().replace(' ','_')] = (col, key)
+        text_features = {}
+        for col in pp.str_columns:
+            for k, name in enumerate(tfidf_feature_names(col, pp.tfidf_vectorizers_map[col])):
+                text_features[name] = (col, k)
+        scaled_columns = pp.num_columns if pp.sparse_output else list(pp.X_columns)
+        scaled_index = {c: k for k, c in enumerate(scaled_columns)}
+        for j, f in enumerate(self.feature_names):
+            if f in scaled_index:
+                self.scale[j] = pp.scaler.scale_[scaled_index[f]]
+                self.offset[j] = pp.scaler.min_[scaled_index[f]]
+            if f in pp.num_columns:
+                self.num_items.append((f, j))
+            elif f in hot_features:
+                col, key = hot_features[f]
+                self.hot_items.setdefault(col, {})[key] = j
+            else:
+                col, k = text_features[f]
+                vocab_idx, feat_idx = self.text_items.get(col, ([], []))
+                self.text_items[col] = (vocab_idx + [k], feat_idx + [j])
+        self.num_index = np.array([j for _, j in self.num_items], dtype=np.intp)
+        self.dtype = np.float32
+        if not pp.sparse_output:
+            self.dtype = np.result_type(*[pp.dtypes[f] for f in self.feature_names]) if n > 0 else np.float32
+
+    def __alloc(self, batch_size):
+        self.batch_size = batch_size
+        self.__X = np.zeros((batch_size, len(self.feature_names)))
+        self.__X_out = np.zeros((batch_size, len(self.feature_names)), dtype=self.dtype)
+        self.__X_target = {y: np.zeros((batch_size, len(self.target_index[y])), dtype=self.dtype) for y in self.targets}
+
+    def __features(self, records):
+        #model inputs of each target, or None when the fast path does not apply
+        n = len(records)
+        if n > self.batch_size:
+            self.__alloc(max(n, 2 * self.batch_size))
+        X = self.__X[:n]
+        X.fill(0)
+        for i, record in enumerate(records):
+            for col, j in self.num_items:
+                value = record.get(col)
+                X[i, j] = np.nan if value is None else value
+            for col, cat_index in self.hot_items.items():
+                value = record.get(col)
+                if value is None or value != value:
+                    value = self.NAN_KEY
+                if value in cat_index:
+                    X[i, cat_index[value]] = 1
+                elif not any(value == c for c in self.preprocessing.onehot_encoder.categories_[self.preprocessing.hot_columns.index(col)]):
+                    raise ValueError('Found unknown category ' + str(value) + ' in column ' + col)
+        if len(self.num_index) > 0 and np.isnan(X[:, self.num_index]).any():
+            return None
+        for col, (vocab_idx, feat_idx) in self.text_items.items():
+            vectorizer = self.preprocessing.tfidf_vectorizers_map[col]
+            X_tfidf = vectorizer.transform(preprocess_text_batch([record.get(col) for record in records]))
+            X[:, feat_idx] = X_tfidf[:, vocab_idx].toarray()
+        X *= self.scale
+        X += self.offset
+        X_out = self.__X_out[:n]
+        np.copyto(X_out, X, casting='same_kind')
+        X_target = {}
+        for y in self.targets:
+            X_target[y] = self.__X_target[y][:n]
+            np.take(X_out, self.target_index[y], axis=1, out=X_target[y])
+        return X_target
+
+    def __features_slow(self, records):
+        X = self.preprocessing.transform(pd.DataFrame(records))
+        X_target = {}
+        for y in self.targets:
+            X_y = self.preprocessing.take(X, self.features_map[y], dense=not accepts_sparse(self.models[y]))
+            X_target[y] = X_y if sparse.issparse(X_y) else np.asarray(X_y)
+        return X_target
+
+    def __run(self, records, y, proba):
+        if isinstance(records, dict):
+            records = [records]
+        X_target = self.__features(records)
+        if X_target is None:
+            X_target = self.__features_slow(records)
+        targets = self.targets if y is None else [y]
+        result = {}
+        for target in targets:
+            if proba:
+                result[target] = self.models[target].predict_proba(X_target[target])
+            else:
+                y_pred = self.models[target].predict(X_target[target])
+                if self.classes_map[target] is not None:
+                    y_pred = self.classes_map[target][np.asarray(y_pred, dtype=np.intp)]
+                result[target] = y_pred
+        return result if y is None else result[y]
+
+    def predict(self, records, y=None):
+        #records: dict or list of dicts with the source columns
+        #returns {target: predictions} or the predictions of y
+        return self.__run(records, y, False)
+
+    def predict_proba(self, records, y=None):
+        return self.__run(records, y, True)
+
+def resolve_algorithm(algo):
+    #algorithms map keys can be 'module.Class' strings, imported only when an AutoML is created
+    if type(algo) != str:
+        return algo
+    module_name, class_name = algo.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+def cap_algorithms_n_jobs(algorithms, n_jobs):
+    #the estimators with a n_jobs parameter use n_jobs threads (user search spaces included)
+    capped = {}
+    for algo_class, params in algorithms.items():
+        algo_instance = algo_class(estimators=[]) if is_Voting_or_Stacking(algo_class) else algo_class()
+        if isinstance(params, dict) and 'n_jobs' in algo_instance.get_params():
+            params = dict(params, n_jobs=[n_jobs])
+        capped[algo_class] = params
+    return capped
+
 def default_algorithms(n_jobs):
+    from sklearn import linear_model, neighbors, svm, tree
+    from sklearn.discriminant_analysis import QuadraticDiscriminantAnalysis
+    from sklearn.ensemble import (AdaBoostClassifier, GradientBoostingClassifier,
+                                  GradientBoostingRegressor,
+                                  HistGradientBoostingClassifier,
+                                  RandomForestClassifier, StackingClassifier,
+                                  VotingClassifier)
+    from sklearn.gaussian_process import GaussianProcessClassifier
+    from sklearn.naive_bayes import GaussianNB, MultinomialNB
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.svm import SVC
+    from sklearn.tree import DecisionTreeClassifier
+    from xgboost import XGBClassifier, XGBRegressor, XGBRFRegressor
     return {
         #classifiers
         #https://scikit-learn.org/stable/auto_examples/classification/plot_classifier_comparison.html
@@ -561,51 +2008,55 @@ def default_algorithms(n_jobs):
         GradientBoostingRegressor:{},    
     }    
   
-def preprocess_text(text_data):
-    
-    stopwords= ['i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', "you're", "you've",\
-                "you'll", "you'd", 'your', 'yours', 'yourself', 'yourselves', 'he', 'him', 'his', 'himself', \
-                'she', "she's", 'her', 'hers', 'herself', 'it', "it's", 'its', 'itself', 'they', 'them', 'their',\
-                'theirs', 'themselves', 'what', 'which', 'who', 'whom', 'this', 'that', "that'll", 'these', 'those', \
-                'am', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'having', 'do', 'does', \
-                'did', 'doing', 'a', 'an', 'the', 'and', 'but', 'if', 'or', 'because', 'as', 'until', 'while', 'of', \
-                'at', 'by', 'for', 'with', 'about', 'against', 'between', 'into', 'through', 'during', 'before', 'after',\
-                'above', 'below', 'to', 'from', 'up', 'down', 'in', 'out', 'on', 'off', 'over', 'under', 'again', 'further',\
-                'then', 'once', 'here', 'there', 'when', 'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more',\
-                'most', 'other', 'some', 'such', 'only', 'own', 'same', 'so', 'than', 'too', 'very', \
-                's', 't', 'can', 'will', 'just', 'don', "don't", 'should', "should've", 'now', 'd', 'll', 'm', 'o', 're', \
-                've', 'y', 'ain', 'aren', "aren't", 'couldn', "couldn't", 'didn', "didn't", 'doesn', "doesn't", 'hadn',\
-                "hadn't", 'hasn', "hasn't", 'haven', "haven't", 'isn', "isn't", 'ma', 'mightn', "mightn't", 'mustn',\
-                "mustn't", 'needn', "needn't", 'shan', "shan't", 'shouldn', "shouldn't", 'wasn', "wasn't", 'weren', "weren't", \
-                'won', "won't", 'wouldn', "wouldn't"]    
-    
-    def decontracted(phrase):
-        # specific
-        phrase = re.sub(r"won't", "will not", phrase)
-        phrase = re.sub(r"can\'t", "can not", phrase)
-        # general
-        phrase = re.sub(r"n\'t", " not", phrase)
-        phrase = re.sub(r"\'re", " are", phrase)
-        phrase = re.sub(r"\'s", " is", phrase)
-        phrase = re.sub(r"\'d", " would", phrase)
-        phrase = re.sub(r"\'ll", " will", phrase)
-        phrase = re.sub(r"\'t", " not", phrase)
-        phrase = re.sub(r"\'ve", " have", phrase)
-        phrase = re.sub(r"\'m", " am", phrase)
-        return phrase    
-    
+# https://gist.github.com/sebleier/554280
+STOPWORDS = frozenset(['i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', "you're", "you've",\
+            "you'll", "you'd", 'your', 'yours', 'yourself', 'yourselves', 'he', 'him', 'his', 'himself', \
+            'she', "she's", 'her', 'hers', 'herself', 'it', "it's", 'its', 'itself', 'they', 'them', 'their',\
+            'theirs', 'themselves', 'what', 'which', 'who', 'whom', 'this', 'that', "that'll", 'these', 'those', \
+            'am', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'having', 'do', 'does', \
+            'did', 'doing', 'a', 'an', 'the', 'and', 'but', 'if', 'or', 'because', 'as', 'until', 'while', 'of', \
+            'at', 'by', 'for', 'with', 'about', 'against', 'between', 'into', 'through', 'during', 'before', 'after',\
+            'above', 'below', 'to', 'from', 'up', 'down', 'in', 'out', 'on', 'off', 'over', 'under', 'again', 'further',\
+            'then', 'once', 'here', 'there', 'when', 'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more',\
+            'most', 'other', 'some', 'such', 'only', 'own', 'same', 'so', 'than', 'too', 'very', \
+            's', 't', 'can', 'will', 'just', 'don', "don't", 'should', "should've", 'now', 'd', 'll', 'm', 'o', 're', \
+            've', 'y', 'ain', 'aren', "aren't", 'couldn', "couldn't", 'didn', "didn't", 'doesn', "doesn't", 'hadn',\
+            "hadn't", 'hasn', "hasn't", 'haven', "haven't", 'isn', "isn't", 'ma', 'mightn', "mightn't", 'mustn',\
+            "mustn't", 'needn', "needn't", 'shan', "shan't", 'shouldn', "shouldn't", 'wasn', "wasn't", 'weren', "weren't", \
+            'won', "won't", 'wouldn', "wouldn't"])
+
+#decontractions in a single pass (the replacements have no apostrophe, so the order of the old re.sub calls is kept)
+DECONTRACTIONS = {"won't": "will not", "can't": "can not"
+                  , "n't": " not", "'re": " are", "'s": " is", "'d": " would"
+                  , "'ll": " will", "'t": " not", "'ve": " have", "'m": " am"}
+DECONTRACTIONS_RE = re.compile("won't|can't|n't|'re|'s|'d|'ll|'t|'ve|'m")
+ESCAPES_RE = re.compile(r'\\[rn"]')
+WORDS_RE = re.compile('[A-Za-z0-9]+')
+
+def preprocess_sentence(sentence):
+    sent = DECONTRACTIONS_RE.sub(lambda m: DECONTRACTIONS[m.group(0)], sentence)
+    sent = ESCAPES_RE.sub(' ', sent)
+    words = (w.lower() for w in WORDS_RE.findall(sent))
+    return ' '.join(w for w in words if w not in STOPWORDS)
+
+def preprocess_text_batch(text_batch):
+    return [preprocess_sentence(sentence) for sentence in text_batch]
+
+def preprocess_text(text_data, n_jobs=1, batch_size=10000):
+    text_data = list(text_data)
+    batches = [text_data[i:i+batch_size] for i in range(0, len(text_data), batch_size)]
+    if n_jobs != 1 and len(batches) > 1:
+        #large corpora: batches sharded across processes
+        result_list = Parallel(n_jobs=n_jobs, backend='loky')(delayed(preprocess_text_batch)(batch)
+                                                              for batch in batches)
+    else:
+        # tqdm is for printing the status bar
+        result_list = [preprocess_text_batch(batch) for batch in tqdm(batches)]
     preprocessed_text = []
-    # tqdm is for printing the status bar
-    for sentence in tqdm(text_data):
-        sent = decontracted(sentence)
-        sent = sent.replace('\\r', ' ')
-        sent = sent.replace('\\n', ' ')
-        sent = sent.replace('\\"', ' ')
-        sent = re.sub('[^A-Za-z0-9]+', ' ', sent)
-        # https://gist.github.com/sebleier/554280
-        sent = ' '.join(e for e in sent.split() if e.lower() not in stopwords)
-        preprocessed_text.append(sent.lower().strip())
-    return preprocessed_text  
+    for result in result_list:
+        preprocessed_text.extend(result)
+    return preprocessed_text
+
 class AutoML:
     def __init__(self, ds_source, y_colname = 'y'
                  , algorithms = None
@@ -627,12 +2078,48 @@ class AutoML:
                  , n_folds_cv = 10
                  , drop_nan_values = False
                  , predict_proba = False
+                 , ga_backend = None
+                 , ga_n_jobs = -1
+                 , cache_dir = None
+                 , results_top_k = 10
+                 , results_spill_dir = None
+                 , corr_method = 'pearson'
+                 , corr_chunk_size = None
+                 , corr_block_size = 1024
+                 , corr_memmap_dir = None
+                 , sparse_features = False
+                 , shared_data = False
+                 , successive_halving = False
+                 , halving_resource = 'n_samples'
+                 , halving_factor = 3
+                 , low_fidelity = False
+                 , low_fidelity_frac = 0.2
+                 , low_fidelity_folds = 3
+                 , full_tuning_top_frac = 0.2
+                 , ga_patience = None
+                 , ga_time_budget = None
+                 , ga_max_evaluations = None
+                 , ga_hof_size = 10
+                 , time_budget = None
+                 , n_cores = None
+                 , warm_start_from = None
+                 , ga_algo_mutpb = 0.05
+                 , ga_niching = False
+                 , ds_chunksize = None
+                 , dtype_float_floor = np.float32
+                 , to_process_chunksize = 10000
+                 , event_callback = None
+                 , events_log = False
                  ) -> None:
         self.start_time = datetime.now()
 
         #logging.basicConfig(format='%(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S')
                 
-        ProgressBar.enable()
+        try: #modin progress bars (optional)
+            from modin.config import ProgressBar
+            ProgressBar.enable()
+        except ImportError:
+            pass
         
         #ray_init()
         optimize_pandas()
@@ -640,51 +2127,156 @@ class AutoML:
         #initializing variables
         self.results = {}
         self.algorithms = algorithms
+        if algorithms is not None:
+            self.algorithms = {resolve_algorithm(a): p for a, p in algorithms.items()}
         if algorithms is None:
             self.algorithms = default_algorithms(n_jobs)
+        if n_cores is not None:
+            #with a cores budget the estimators run single threaded (the cores are split by budget_plan)
+            self.algorithms = cap_algorithms_n_jobs(self.algorithms, 1)
         self.__unique_categoric_limit = unique_categoric_limit
         self.min_x_y_correlation_rate = min_x_y_correlation_rate #TODO: #1 MIN_X_Y_CORRELATION_RATE: define this value dynamically
         self.RANDOM_STATE = 1102
         self.ds_name = ds_name
         self.ngen = ngen
+        #GA stop criteria (besides ngen): generations without improvement, seconds, evaluated individuals
+        self.ga_patience = ga_patience
+        self.ga_time_budget = ga_time_budget
+        self.ga_max_evaluations = ga_max_evaluations
+        self.ga_hof_size = ga_hof_size
+        #probability of changing the algorithm gene in a mutation, selection inside each algorithm niche
+        self.ga_algo_mutpb = ga_algo_mutpb
+        self.ga_niching = ga_niching
+        self.hall_of_fame_map = {}
+        self.ga_logbook_map = {}
+        self.ga_stop_reason_map = {}
+        #hall of fame file(s) of a previous run: path or {y: path}
+        self.warm_start_from = warm_start_from
+        self.warm_params_map = {}
         self.pool = pool
         self.grid_search = grid_search
+        #successive halving search (used when grid_search is False): 'n_samples' or 'n_estimators' resource
+        self.successive_halving = successive_halving
+        self.halving_resource = halving_resource
+        self.halving_factor = halving_factor
+        #two-stage GA fitness: cheap score first, full tuning only for the top individuals
+        self.low_fidelity = low_fidelity
+        self.low_fidelity_frac = low_fidelity_frac
+        self.low_fidelity_folds = low_fidelity_folds
+        self.full_tuning_top_frac = full_tuning_top_frac
+        self.low_fidelity_cache_map = {}
         self.n_inter_bayessearch = n_inter_bayessearch
         self.features_engineering = features_engineering
         self.do_redundance_test_X = do_redundance_test_X
+        #features x Y screening criterion: 'pearson', 'spearman' or 'mutual_info'
+        self.corr_method = corr_method
+        self.corr_chunk_size = corr_chunk_size
+        #features x features redundance test: float32 blocks, optionally memory mapped
+        self.corr_block_size = corr_block_size
+        self.corr_memmap_dir = corr_memmap_dir
+        #keeps X as a CSR matrix (TF-IDF and one hot features)
+        self.sparse_features = sparse_features
+        #multiprocessing workers read X from a memory mapped file
+        self.shared_data = shared_data
+        self.X_memmap_path = None
         self.flush_intermediate_steps = flush_intermediate_steps
         self.n_jobs = n_jobs
         self.n_folds_cv = n_folds_cv
         self.predict_proba = predict_proba
+        #GA fitness evaluation backend: None (serial), 'multiprocessing', 'loky' or 'ray'
+        self.ga_backend = ga_backend
+        if ga_backend is None and pool is not None:
+            self.ga_backend = 'multiprocessing'
+        self.ga_n_jobs = ga_n_jobs
+        if ga_n_jobs is None or ga_n_jobs < 1:
+            self.ga_n_jobs = os.cpu_count()
+        #global budget: wall clock seconds (since the start) and cores shared by the targets
+        self.time_budget = time_budget
+        self.n_cores = n_cores
+        self.targets_n_jobs = n_jobs
+        self.search_n_jobs = n_jobs
+        if n_cores is not None:
+            n_targets = 1 if type(y_colname) == str else len(y_colname)
+            self.n_jobs, self.targets_n_jobs, self.search_n_jobs, self.ga_n_jobs = budget_plan(n_cores, n_targets, self.ga_backend)
+        self.created_pool = False
+        self.shared_data_dir = None
+        self.worker_data_map = {}
+        #fitness cache: (algorithm class, features bitmask) -> fitness
+        self.fitness_cache_map = {}
+        #opt-in on disk evaluation cache: resumable runs
+        self.cache_dir = cache_dir
+        if cache_dir is not None and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self.ds_fingerprint_map = {}
+        #fitted estimators kept in memory: top-k and the best of each algorithm (the others are spilled or dropped)
+        self.results_top_k = results_top_k
+        self.results_spill_dir = results_spill_dir
+        if results_spill_dir is not None and not os.path.exists(results_spill_dir):
+            os.makedirs(results_spill_dir)
         
         #initializing control maps
         self.selected_algos_map = {}
-        self.n_bits_algos_map = {}
-        self.X_bitmap_map = {}
         self.main_metric_map = {}
-        
+        self.best_score_map = {}
+        #batch scoring of the ./to_process files (streamed by chunks)
+        self.to_process_path = os.path.abspath('./to_process') #process directory
+        self.to_process_chunksize = to_process_chunksize
+        self.scoring_pending = False
+        #instrumentation: callable(event dict) and/or json lines log, counters and per algorithm summary
+        self.event_callback = event_callback
+        self.events_log = events_log
+        self.stats_map = {}
+        self.algorithm_summary_map = {}
+        #seconds of each stage: ingest, encode, impute, scale, split, screen, balance and ga (targets summed)
+        self.stage_times = {}
+        t0 = time.perf_counter()
+
+        #streaming ingestion: ds_source files are read in chunks of ds_chunksize rows
+        self.ds_chunksize = ds_chunksize
+        self.ds_profile = None
         if type(ds_source) == str:
-            if ds_source.endswith('.csv'):
+            if ds_chunksize is not None:
+                logging.info('Profiling the source dataset in chunks of ' + str(ds_chunksize) + ' rows...')
+                self.ds_profile = ds_source_profile(read_ds_chunks(ds_source, ds_chunksize, ds_source_header, ds_source_header_names)
+                                                    , unique_categoric_limit, dtype_float_floor)
+                if len(self.ds_profile['mixed']) > 0:
+                    #numeric and text chunks: profiled again read as str, like a single read of the source
+                    read_dtypes = {col: str for col in self.ds_profile['mixed']}
+                    self.ds_profile = ds_source_profile(read_ds_chunks(ds_source, ds_chunksize, ds_source_header, ds_source_header_names
+                                                                       , dtype=read_dtypes)
+                                                        , unique_categoric_limit, dtype_float_floor)
+                    self.ds_profile['read_dtypes'] = read_dtypes
+                logging.info('Source dataset rows: ' + str(self.ds_profile['n_rows']))
+                ds_source = read_ds_sample(ds_source, ds_chunksize, ds_source_header, ds_source_header_names
+                                           , self.ds_profile, ds_sample_frac, drop_nan_values, self.RANDOM_STATE)
+            elif ds_source.endswith('.csv'):
                 ds_source = pd.read_csv(ds_source, header=ds_source_header, names=ds_source_header_names)
             elif ds_source.endswith('.gzip'):
                 ds_source = pd.read_parquet(ds_source)
         
-        logging.info('Optimizing the source dataset:')
-        ds = reduce_mem_usage(ds_source)
+        #dtypes compaction: floats never below dtype_float_floor, low cardinality text columns as category
+        self.dtype_float_floor = dtype_float_floor
+        self.dtypes_report = None
+        if self.ds_profile is None:
+            logging.info('Optimizing the source dataset:')
+            ds, self.dtypes_report = optimize_dtypes(ds_source, float_floor=dtype_float_floor
+                                                     , category_limit=unique_categoric_limit)
+        else: #already casted to the dtypes of the full source
+            ds = ds_source
         del(ds_source) #free memory
         logging.info('Original dataset dimensions: ' + str(ds.shape))
         
         #NaN values
-        self.iterative_imputer = None
         if drop_nan_values:
             ds = ds.dropna()
             logging.info('Dataset dimensions after drop NaN values: ' + str(ds.shape))
         
-        #shuffle data to minimize bias tendency
-        ds = ds.sample(frac=ds_sample_frac)
+        #shuffle data to minimize bias tendency (the streaming ingestion samples while reading)
+        ds = ds.sample(frac=ds_sample_frac if self.ds_profile is None else 1, random_state=self.RANDOM_STATE)
         
         if flush_intermediate_steps:
             _flush_intermediate_steps(ds, [self.ds_name, 'sample_frac', str(int(ds_sample_frac*100))])
+        add_stage_time(self.stage_times, 'ingest', t0)
 
         self.y_colname_list = y_colname
         if type(self.y_colname_list) == str:
@@ -696,6 +2288,7 @@ class AutoML:
         self.y_classes_map = {}
         self.X_train_map = {}
         self.X_test_map = {}
+        self.X_columns_map = {}
         self.y_train_map = {}
         self.y_test_map = {}
         self.y_is_categoric_map = {}
@@ -703,58 +2296,43 @@ class AutoML:
         #setting X
         self.X = ds.drop(self.y_colname_list, axis=1)
         del(ds)
-        self.__onehot_encoder = OneHotEncoder(sparse=False, dtype=int)
         self.hot_columns = []
         self.str_columns = []
         for i, col in enumerate(self.X.columns):
-            if self.X.dtypes[i] == object: 
-                if len(self.X[col].unique()) <= self.__unique_categoric_limit:
+            if is_object_or_category(self.X.dtypes[i]): 
+                if self.ds_profile is not None: #categories of the full source, not only of the sample
+                    if col in self.ds_profile['categories']:
+                        self.hot_columns.append(col)
+                    else:
+                        self.str_columns.append(col)
+                elif len(self.X[col].unique()) <= self.__unique_categoric_limit:
                     self.hot_columns.append(col)
                 else:
                     self.str_columns.append(col)
+        onehot_categories = 'auto'
+        source_range = None
+        if self.ds_profile is not None:
+            onehot_categories = [self.ds_profile['categories'][col] for col in self.hot_columns]
+            source_range = {col: (self.ds_profile['min'][col], self.ds_profile['max'][col]) for col in self.ds_profile['min']}
         
-        self.tfidf_vectorizers_map = {}
-        
-        if len(self.str_columns) > 0:
-            #do tfidf
-            result_list = Parallel(n_jobs=self.n_jobs, backend='multiprocessing')(delayed(parallel_tfidf) 
-                                    (col_name, self.X[col_name])
-                                    for col_name in self.str_columns)
-            for result in result_list:
-                self.tfidf_vectorizers_map[result[0]] = result[2]
-                self.X = pd.concat([self.X.reset_index(drop=True), result[1]], axis=1)    
-                
-            self.X = self.X.drop(self.str_columns, axis=1)
-            logging.info('X dimensions after Tfidf: ' + str(self.X.shape))
-            
-        if len(self.hot_columns) > 0:
-            logging.info('One hot encoder columns: ' +str(self.hot_columns))
-            self.__onehot_encoder.fit(self.X[self.hot_columns])
-            self.hot_cols_names = []
-            for i, name in enumerate(self.__onehot_encoder.feature_names_in_):
-                for cat in self.__onehot_encoder.categories_[i]:
-                    self.hot_cols_names.append(name + '_' + str(cat).lower().replace(' ','_'))
-            temp_df = self.__onehot_encoder.transform(self.X[self.hot_columns])
-            temp_df = pd.DataFrame(temp_df , columns=self.hot_cols_names) 
-            self.X = pd.concat([self.X.reset_index(drop=True), temp_df], axis=1)
-            self.X = self.X.drop(self.hot_columns, axis=1)
-            del(temp_df)
-            logging.info('X dimensions after One hot encoder: ' + str(self.X.shape))
-
-        if not drop_nan_values:
-            #inpuiting values for X NaN values
-            self.iterative_imputer = IterativeImputer(random_state=self.RANDOM_STATE)
-            if sum(self.X.isna().sum()) > 0: #there are nan values
-                self.X = pd.DataFrame(self.iterative_imputer.fit_transform(self.X)
-                                        , columns=self.X.columns)
-
-        #normalizing the variables
-        logging.info('Normalizing the variables...')
-        self.scaler = preprocessing.MinMaxScaler()
-        self.X = pd.DataFrame(self.scaler.fit_transform(self.X), columns=self.X.columns) 
-
-        logging.info('Optimizing the dataset X after Normalization:')
-        self.X = reduce_mem_usage(self.X)
+        #fitted preprocessing: reused to transform the test files and any new data
+        self.preprocessing = PreprocessingPipeline(self.hot_columns, self.str_columns
+                                                   , onehot_categories=onehot_categories
+                                                   , drop_nan_values=drop_nan_values
+                                                   , sparse_output=self.sparse_features
+                                                   , float_floor=self.dtype_float_floor
+                                                   , chunksize=self.ds_chunksize
+                                                   , source_range=source_range
+                                                   , n_jobs=self.n_jobs
+                                                   , random_state=self.RANDOM_STATE)
+        self.X = self.preprocessing.fit_transform(self.X)
+        self.stage_times.update(self.preprocessing.stage_times)
+        self.tfidf_vectorizers_map = self.preprocessing.tfidf_vectorizers_map
+        self.hot_cols_names = self.preprocessing.hot_cols_names
+        self.iterative_imputer = self.preprocessing.iterative_imputer
+        self.scaler = self.preprocessing.scaler
+        #sparse X column names
+        self.X_columns = self.preprocessing.X_columns if self.sparse_features else None
         logging.info('X dimensions after Normalization: ' + str(self.X.shape))
 
         self.metrics_regression_map = metrics
@@ -771,14 +2349,26 @@ class AutoML:
         for y in self.y_colname_list:
             self.YisCategorical(y)
         
+        if self.shared_data:
+            #the workers attach to a memory mapped X instead of receiving a pickled copy per target
+            X_memmap_dir = tempfile.mkdtemp(prefix='automl_X_')
+            self.X_memmap_path = os.path.join(X_memmap_dir, 'X.joblib')
+            dump(self.X, self.X_memmap_path)
+
         result_list = Parallel(n_jobs=self.n_jobs, backend='multiprocessing')(delayed(parallel_process_y) 
                                 (self, y)
                                 for y in self.y_colname_list)
+
+        if self.X_memmap_path is not None:
+            shutil.rmtree(os.path.dirname(self.X_memmap_path), ignore_errors=True)
+            self.X_memmap_path = None
             
         selected_features = []
         for tuple_result in result_list:
             y = tuple_result[0]
             selected_features.append(tuple_result[1])
+            self.X_columns_map[y] = pd.Index(tuple_result[1])
+            self.preprocessing.columns_map[y] = self.X_columns_map[y]
             self.y_encoder_map[y] = tuple_result[2]
             self.y_full[y] = tuple_result[3]
             self.y_classes_map[y] = tuple_result[4]
@@ -805,7 +2395,9 @@ class AutoML:
             self.X_test_map[y] = tuple_result[6]
             self.y_train_map[y] = tuple_result[7]
             self.y_test_map[y] = tuple_result[8]
-            
+            for stage, seconds in tuple_result[9].items():
+                self.stage_times[stage] = self.stage_times.get(stage, 0) + seconds
+
         if self.flush_intermediate_steps:
             features_set = set()
             for feat_list in selected_features:
@@ -818,65 +2410,48 @@ class AutoML:
                                         , output_type='csv')            
             
         #balancing the train datasets
+        t0 = time.perf_counter()
+        from imblearn.over_sampling import RandomOverSampler
         for y in self.y_colname_list:
             logging.info('[' + y + '] Balancing the dataset...')
             logging.info('[' + y + '] X_train dimensions BEFORE Balancing Process: ' + str(self.X_train_map[y].shape))
             over = RandomOverSampler(random_state=self.RANDOM_STATE)
             self.X_train_map[y], self.y_train_map[y] = over.fit_resample(self.X_train_map[y], self.y_train_map[y])
             logging.info('[' + y + '] X_train dimensions AFTER Balancing Process: ' + str(self.X_train_map[y].shape))
+        add_stage_time(self.stage_times, 'balance', t0)
 
-        if flush_intermediate_steps:
+        if flush_intermediate_steps and not self.sparse_features: #the sparse X is not densified to be saved
             pass
             #TODO: add balanced datasets
             _flush_intermediate_steps(pd.concat([self.X.reset_index(drop=True), self.y_full.reset_index(drop=True)], axis=1)
                                         , [self.ds_name, 'NORMAL_BALANCED'])
 
-        #loading test files
-        self.test_df_map = {}
-        test_path = os.path.abspath('./to_process') #process directory
-        if os.path.exists(test_path):
-            for file in os.listdir(test_path):
-                if file.endswith('.csv'):
-                    logging.info('Processing test file: ' + str(file))
-                    file_path = os.path.join(test_path, file)
-                    df_test = pd.read_csv(file_path)
-                    df_test = df_test.drop(columns=self.y_colname_list)
-                    
-                    #tfidf
-                    for col in df_test.columns:
-                        if col in self.str_columns:
-                            tfidf_vect = self.tfidf_vectorizers_map[col]
-                            X_tfidf = tfidf_vect.transform(preprocess_text(df_test[col]))
-                            X_tfidf = pd.DataFrame(X_tfidf.toarray())
-                            X_tfidf.columns = tfidf_vect.get_feature_names_out(X_tfidf.columns)
-                            X_tfidf = X_tfidf.add_prefix(col + '_')
-                            df_test = pd.concat([df_test.reset_index(drop=True), X_tfidf.reset_index(drop=True)], axis=1)
-                    
-                    #hot encoding
-                    X_hot = self.__onehot_encoder.transform(df_test[self.hot_columns])
-                    X_hot = pd.DataFrame(X_hot , columns=self.hot_cols_names)        
-                    df_test = pd.concat([df_test.reset_index(drop=True), X_hot], axis=1)
-                    df_test = df_test.drop(self.hot_columns, axis=1)
-
-                    if drop_nan_values:
-                        df_test = df_test.dropna()
-                        logging.info('Test dataset dimensions after drop NaN values: ' + str(df_test.shape))
-                    elif sum(df_test.isna().sum()) > 0: #there are nan values
-                        if self.iterative_imputer.estimator is None:
-                            self.iterative_imputer.fit(self.X)
-                        df_test = pd.DataFrame(self.iterative_imputer.transform(df_test)
-                                               , columns=df_test.columns)
-                    #saving in control map
-                    self.test_df_map[str(file).replace('.csv', '')] = reduce_mem_usage(df_test)
+    def __getstate__(self):
+        #pool objects cannot be passed between processes or pickled
+        self_dict = self.__dict__.copy()
+        self_dict['pool'] = None
+        self_dict['created_pool'] = False
+        self_dict['event_callback'] = None #only called by the main process
+        if self_dict.get('X_memmap_path') is not None:
+            self_dict['X'] = None #reattached in __setstate__
+        return self_dict
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.__dict__.get('X_memmap_path') is not None and self.X is None:
+            #zero-copy view of the shared X
+            self.X = load(self.X_memmap_path, mmap_mode='r')
 
     def clearResults(self):
         self.results = {} #cleaning the previous results
+        self.fitness_cache_map = {}
+        self.low_fidelity_cache_map = {}
         
-    def getBestModel(self):
-        if self.getBestResult() is None:
+    def getBestModel(self, y=None):
+        if self.getBestResult(y) is None:
             return None
         #else
-        return self.getBestResult().estimator
+        return self.getBestResult(y)['algorithm']
 
     def getBestConfusionMatrix(self):
         return self.getConfusionMatrix(0)
@@ -912,14 +2487,37 @@ class AutoML:
                                      , custom_metrics=custom_metrics);    
         '''
                 
-    def getBestResult(self):
-        pass
-        '''
-        if len(self.__fit()) == 0:
+    def getBestResult(self, y=None):
+        y = self.y_colname_list[0] if y is None else y
+        if y not in self.results or len(self.results[y]) == 0:
             return None
         #else
-        return self.__fit().iloc[0]
-        '''
+        row = self.results[y].best_row()
+        result = {'algorithm': self.results[y].get_estimator(row)
+                  , 'params': self.results[y].params[row]
+                  , 'features': self.results[y].features_tuple(self.results[y].features_masks[row])
+                  , 'confusion_matrix': self.results[y].confusion_matrices[row]}
+        for col in self.results[y].numeric_columns:
+            result[col] = self.results[y].column(col)[row]
+        return pd.Series(result)
+
+    def getPredictor(self, max_batch_size=64):
+        #best model of each target bundled with the fitted preprocessing
+        models = best_models(self)
+        if len(models) == 0:
+            return None
+        return Predictor(self.preprocessing, models, self.y_encoder_map, max_batch_size)
+
+    def exportPredictor(self, file_path=None):
+        #joblib file with the Predictor (load it with joblib.load)
+        predictor = self.getPredictor()
+        if predictor is None:
+            return None
+        if file_path is None:
+            file_path = _intermediate_file_path(['PREDICTOR', self.ds_name], dth=self.start_time, output_type='joblib')
+        dump(predictor, file_path)
+        logging.info(os.path.basename(file_path) + ' saved')
+        return file_path
     def getResults(self, buffer=True):
         return self.__fit(buffer)
         #results_df = self.__fit(buffer).drop(['confusion_matrix', 'n_features'], axis=1)
@@ -950,7 +2548,16 @@ class AutoML:
             y_is_num = not y_is_cat
             
             columns_list_map.update(tuple_result[1])
-            self.results[y] = tuple_result[2]
+            #the fitness cache and the results survive between getResults() calls
+            #(a cache hit adds no row: its result is already in the store)
+            if y not in self.results:
+                self.results[y] = ResultsStore(columns_list_map[y], self.getMetrics(y)[0], self.getFeaturesNames(y)
+                                               , top_k=self.results_top_k, spill_dir=self.results_spill_dir)
+            self.fitness_cache_map.setdefault(y, {})
+            self.low_fidelity_cache_map.setdefault(y, {})
+            self.warm_params_map.setdefault(y, {})
+            self.stats_map[y] = dict.fromkeys(['memory_cache_hits', 'batch_duplicates', 'disk_cache_hits', 'fits'
+                                               , 'evaluation_time', 'flush_time'], 0)
             self.selected_algos_map[y] = []
             for algo in self.algorithms.keys():
                 if  ((y_is_cat and is_in_class_tree(RegressorMixin, algo)) #Y is incompatible with algorithm        
@@ -959,12 +2566,6 @@ class AutoML:
                     continue
                 #else: all right
                 self.selected_algos_map[y].append(algo)
-            
-            #setup the bitmap to genetic algorithm
-            self.n_bits_algos_map[y] = len(bautil.int2ba(len(self.selected_algos_map[y])-1))#TODO: analyze de number of bits to use
-            n_cols = self.X_train_map[y].shape[1] + self.n_bits_algos_map[y]
-            self.X_bitmap_map[y] = bitarray(n_cols)
-            self.X_bitmap_map[y].setall(1)
 
             #main metric column
             self.main_metric_map[y] = self.getMetrics(y)[0] #considering the first element the most important
@@ -975,23 +2576,114 @@ class AutoML:
                 + ' | Nº of algorithms: ' + str(len(self.selected_algos_map[y])))
 
         del(result_list)
+
+        #data shared with the GA workers
+        if self.ga_backend in ['multiprocessing', 'loky']:
+            self.shared_data_dir = tempfile.mkdtemp(prefix='automl_')
+        if self.ga_backend == 'multiprocessing' and self.pool is None:
+            self.pool = Pool(processes=self.ga_n_jobs)
+            self.created_pool = True
+        for y in self.y_colname_list:
+            self.worker_data_map[y] = share_worker_data(self, y)
+            if self.cache_dir is not None and y not in self.ds_fingerprint_map:
+                self.ds_fingerprint_map[y] = hash_obj((self.X_train_map[y], self.y_train_map[y]
+                                                       , self.X_test_map[y], self.y_test_map[y]))
                 
         def ga_process_fit(y):                    
             toolbox = ga_toolbox(self, y)
             #running the GA algorithm
-            algorithms.eaSimple(toolbox.population(), toolbox, cxpb=0.8, mutpb=0.3, ngen=self.ngen, verbose=False)
+            from deap import tools
+            self.hall_of_fame_map[y] = tools.HallOfFame(self.ga_hof_size)
+            _, self.ga_logbook_map[y], self.ga_stop_reason_map[y] = ga_loop(toolbox.population(), toolbox
+                                        , cxpb=0.8, mutpb=0.3, ngen=self.ngen
+                                        , stats=ga_statistics(), halloffame=self.hall_of_fame_map[y]
+                                        , patience=self.ga_patience, time_budget=self.ga_remaining_time()
+                                        , max_evaluations=self.ga_max_evaluations)
             #free GA memory
             del(toolbox)
+            _flush_intermediate_steps(hall_of_fame_records(self, y), ['HALL_OF_FAME', self.ds_name, y]
+                                      , dth=self.start_time, output_type='joblib')
+            n_gen = len(self.ga_logbook_map[y]) - 1
+            n_evals = sum(self.ga_logbook_map[y].select('nevals'))
+            logging.info('[' + y + '] GA stopped by ' + self.ga_stop_reason_map[y]
+                         + ' after ' + str(n_gen) + ' generations and ' + str(n_evals) + ' evaluations')
+            _append_intermediate_steps({'ga_stop_reason': self.ga_stop_reason_map[y], 'generations': n_gen
+                                        , 'evaluations': n_evals, 'logbook': list(self.ga_logbook_map[y])}
+                                       , ['RESULTS', self.ds_name, y], dth=self.start_time)
             #preparing the results
-            self.results[y].sort_values(by=[self.main_metric_map[y], 'predict_time'], ascending=[False,True], inplace=True)
-            self.results[y] = self.results[y].rename_axis('train_order').reset_index()
+            materialize_results(self, y)
+            self.__summarize(y)
                 
-        Parallel(n_jobs=self.n_jobs, backend="threading")(delayed(ga_process_fit)
+        Parallel(n_jobs=self.targets_n_jobs, backend="threading")(delayed(ga_process_fit)
                                                  (y)
                                                  for y in self.y_colname_list)
+
+        #releasing the GA workers resources
+        self.worker_data_map = {}
+        if self.created_pool:
+            self.pool.terminate()
+            self.pool = None
+            self.created_pool = False
+        if self.shared_data_dir is not None:
+            release_worker_data(self.shared_data_dir)
+            shutil.rmtree(self.shared_data_dir, ignore_errors=True)
+            self.shared_data_dir = None
         
+        add_stage_time(self.stage_times, 'ga', t0)
         logging.info('Fit Time (GA): ' + str(int(time.perf_counter() - t0)) + 's')
-        return self.results
+        if self.scoring_pending:
+            self.processFiles()
+        #the results are materialized as DataFrames only here
+        results = {}
+        for y in self.y_colname_list:
+            results[y] = self.results[y].to_dataframe()
+            results[y].attrs['ga_stop_reason'] = self.ga_stop_reason_map[y]
+        return results
+
+    def processFiles(self, path=None):
+        #scores the csv files of path (default ./to_process) with the current best models, one process per file
+        path = self.to_process_path if path is None else path
+        self.scoring_pending = False
+        if not os.path.exists(path):
+            return []
+        files = sorted([f for f in os.listdir(path) if f.endswith('.csv')])
+        models = best_models(self)
+        if len(files) == 0 or len(models) < len(self.y_colname_list):
+            return []
+        t0 = time.perf_counter()
+        result_list = Parallel(n_jobs=min(self.n_jobs, len(files)), backend='multiprocessing')(delayed(score_file)
+                                (os.path.join(path, file)
+                                 , _intermediate_file_path(['predict', self.ds_name, file.replace('.csv', '')], output_type='csv')
+                                 , self.preprocessing, models, self.y_encoder_map, self.predict_proba
+                                 , self.to_process_chunksize)
+                                for file in files)
+        for out_path, n_rows in result_list:
+            logging.info(os.path.basename(out_path) + ' saved | ' + str(n_rows) + ' rows')
+        logging.info('Scoring Time: ' + str(int(time.perf_counter() - t0)) + 's')
+        return [out_path for out_path, _ in result_list]
+
+    def __summarize(self, y):
+        #instrumentation summary of the target: per algorithm and cache counters
+        stats = self.stats_map[y]
+        self.algorithm_summary_map[y] = algorithm_summary(self.results[y])
+        logging.info('[' + y + '] Algorithms summary:\n' + str(self.algorithm_summary_map[y]))
+        logging.info('[' + y + '] Evaluation: {:.1f}s | search {:.1f}s (cpu {:.1f}s) | scoring {:.1f}s | flushing {:.1f}s'.format(
+            stats['evaluation_time'], self.algorithm_summary_map[y]['search_time'].sum()
+            , self.algorithm_summary_map[y]['search_cpu_time'].sum(), self.algorithm_summary_map[y]['score_time'].sum()
+            , stats['flush_time'])
+            + ' | fits: ' + str(stats['fits']) + ' | cache hits: ' + str(stats['memory_cache_hits']) + ' memory, '
+            + str(stats['batch_duplicates']) + ' batch, ' + str(stats['disk_cache_hits']) + ' disk')
+        emit_event(self, {'event': 'summary', 'y': y, 'stats': dict(stats)
+                          , 'algorithms': self.algorithm_summary_map[y].reset_index().to_dict('records')})
+
+    def ga_remaining_time(self):
+        #GA time budget limited by the global time budget
+        remaining = remaining_time(self)
+        if remaining is None:
+            return self.ga_time_budget
+        if self.ga_time_budget is None:
+            return max(remaining, 0)
+        return max(min(remaining, self.ga_time_budget), 0)
 
     def getMetrics(self, y):
         if self.YisCategorical(y):
@@ -1006,7 +2698,8 @@ class AutoML:
         def is_cat():
             y_type = self.y_full[col_name].dtypes
             if (y_type == np.bool_
-                or y_type == np.str_):
+                or y_type == np.str_
+                or str(y_type) == 'category'):
                 return True
             #else
             if len(self.y_full[col_name].unique()) > self.__unique_categoric_limit:
@@ -1024,19 +2717,19 @@ class AutoML:
         return not self.YisCategorical(y)
     
     def getFeaturesNames(self, y):
-        return self.X_train_map[y].columns    
+        return self.X_columns_map[y]
 
-#utilitary methods
+    def getXColumns(self):
+        if self.X_columns is not None:
+            return self.X_columns #sparse X
+        return self.X.columns
 
-from cf_matrix import make_confusion_matrix
+#utilitary methods
 
 
 def testAutoMLByCSV(csv_path, y_colname):
     return testAutoML(pd.read_csv(csv_path), y_colname=y_colname)
 
-import ds_utils as util
-
-
 def testAutoML(ds, y_colname):
     automl = AutoML(ds, y_colname, min_x_y_correlation_rate=0.06)
     #automl.setAlgorithm(svm.SVC())
@@ -1051,6 +2744,7 @@ def testAutoML(ds, y_colname):
     del(automl)
 
 if __name__ == '__main__':
+    from sklearn.neighbors import KNeighborsClassifier
     #pool = Pool(processes=10)
     #automl = AutoML('datasets/iris.csv', 'class'
     #                , ds_source_header_names=['sepal_length', 'sepal_width', 'petal_length', 'petal_width', 'class']
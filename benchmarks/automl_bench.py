@@ -0,0 +1,201 @@
+#end-to-end benchmark of AutoML over the bundled datasets: fixed seeds and budgets, one fresh interpreter per run
+#records the stage timings (AutoML.stage_times), peak memory, number of fits and the best main metric of each target
+#and compares them with a baseline json (exit code 1 on regression)
+#the timings and memory are the median of --repeat runs (a single run is too noisy for the time tolerance)
+#usage: python benchmarks/automl_bench.py [--datasets iris wine] [--repeat 5] [--json results.json]
+#                                         [--baseline benchmarks/automl_baseline.json] [--save-baseline]
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DS_PATH = os.path.join(REPO_DIR, 'datasets')
+DEFAULT_BASELINE = os.path.join(REPO_DIR, 'benchmarks', 'automl_baseline.json')
+
+SEED = 1102
+STAGES = ['ingest', 'encode', 'impute', 'scale', 'split', 'screen', 'balance', 'ga']
+
+#fixed budget: small search spaces, few generations and bayes iterations (the estimators are seeded too)
+#(skopt reads a 2 values list as a range: the categorical spaces have 3+ values)
+ALGORITHMS = {'sklearn.neighbors.KNeighborsClassifier': {'n_neighbors': [3, 5, 7, 9, 11]}
+              , 'sklearn.tree.DecisionTreeClassifier': {'max_depth': [None, 4, 8], 'random_state': [SEED]}
+              , 'sklearn.ensemble.RandomForestClassifier': {'n_estimators': [20, 50, 100], 'max_depth': [None, 4, 8]
+                                                            , 'random_state': [SEED]}
+              , 'sklearn.linear_model.Ridge': {'alpha': [0.1, 1.0, 10.0]}
+              , 'sklearn.neighbors.KNeighborsRegressor': {'n_neighbors': [3, 5, 7, 9, 11]}
+              , 'sklearn.ensemble.RandomForestRegressor': {'n_estimators': [20, 50, 100], 'max_depth': [None, 4, 8]
+                                                           , 'random_state': [SEED]}}
+AUTOML_KWARGS = {'ngen': 3, 'n_inter_bayessearch': 5, 'n_folds_cv': 3, 'n_jobs': 1, 'ga_hof_size': 5}
+
+#dataset: loader (pandas DataFrame) and target column(s)
+def load_iris(pd):
+    return pd.read_csv(os.path.join(DS_PATH, 'iris.csv'), header=None
+                       , names=['sepal_length', 'sepal_width', 'petal_length', 'petal_width', 'class'])
+
+def load_wine(pd):
+    df = pd.read_csv(os.path.join(DS_PATH, 'winequality-red.csv'), sep=';')
+    df['high_quality'] = (df.quality > df.quality.describe()['75%']).astype(int)
+    return df.drop('quality', axis=1)
+
+def load_fuel(pd):
+    return pd.read_csv(os.path.join(DS_PATH, 'FuelConsumptionCo2.csv'))
+
+def load_housing(pd):
+    df = pd.read_csv(os.path.join(DS_PATH, 'USA-priceHousing.csv')).drop('Address', axis=1)
+    df['high_price'] = df['Price'] > df.Price.describe()['75%']
+    return df.drop('Price', axis=1)
+
+def load_titanic(pd):
+    return pd.read_csv(os.path.join(DS_PATH, 'titanic.csv'), index_col=0)
+
+def load_viaturas(pd):
+    #only the labeled rows (text column: tfidf features)
+    return pd.read_csv(os.path.join(DS_PATH, 'viaturas.csv')).dropna(subset=['com_problema'])
+
+def load_multiple_y(pd):
+    return pd.read_csv(os.path.join(DS_PATH, 'multilple_y.csv'))
+
+DATASETS = {'iris': (load_iris, 'class')
+            , 'wine': (load_wine, 'high_quality')
+            , 'fuel': (load_fuel, 'CO2EMISSIONS')
+            , 'housing': (load_housing, 'high_price')
+            , 'titanic': (load_titanic, 'survived')
+            , 'viaturas': (load_viaturas, 'com_problema')
+            , 'multiple_y': (load_multiple_y, ['y', 'y2'])}
+
+def run_dataset(name):
+    #child process: a single seeded AutoML run
+    import random
+    import time
+    random.seed(SEED)
+    np.random.seed(SEED)
+    import pandas as pd
+    from autoML import AutoML, PeakMemory
+
+    loader, y_colname = DATASETS[name]
+    ds = loader(pd)
+    t0 = time.perf_counter()
+    with PeakMemory() as peak_memory:
+        automl = AutoML(ds, y_colname, algorithms=ALGORITHMS, ds_name=name, **AUTOML_KWARGS)
+        del(ds)
+        automl.getResults()
+    best_metric = {}
+    for y in automl.y_colname_list:
+        best = automl.getBestResult(y)
+        best_metric[y] = None if best is None else float(best[automl.main_metric_map[y]])
+    return {'dataset': name
+            , 'seconds': time.perf_counter() - t0
+            , 'stage_times': {stage: automl.stage_times.get(stage, 0.0) for stage in STAGES}
+            , 'peak_mb': peak_memory.peak_mb
+            , 'n_fits': sum([automl.stats_map[y]['fits'] for y in automl.y_colname_list])
+            , 'main_metric': {y: automl.main_metric_map[y] for y in automl.y_colname_list}
+            , 'best_metric': best_metric}
+
+def run_child(name):
+    #fresh interpreter (imports, caches and peak memory are not shared between the runs) in a temporary directory
+    #(the AutoML results/ files are not written into the repository)
+    work_dir = tempfile.mkdtemp(prefix='automl_bench_')
+    env = dict(os.environ, PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    try:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name], cwd=work_dir, env=env
+                                , check=True, capture_output=True, text=True).stdout
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+def median_run(runs):
+    #median of the timings and memory, fits and metrics of the first run (seeded)
+    result = dict(runs[0])
+    result['seconds'] = float(np.median([r['seconds'] for r in runs]))
+    result['stage_times'] = {stage: float(np.median([r['stage_times'][stage] for r in runs])) for stage in STAGES}
+    result['peak_mb'] = float(np.median([r['peak_mb'] for r in runs]))
+    result['repeat'] = len(runs)
+    return result
+
+def compare(result, baseline, args):
+    #regressions of one dataset: relative time/memory increase, absolute metric decrease
+    regressions = []
+    def check_time(label, value, base_value):
+        if base_value >= args.min_seconds and value > base_value * (1 + args.time_tolerance):
+            regressions.append('{}: {:.2f}s -> {:.2f}s'.format(label, base_value, value))
+    check_time('seconds', result['seconds'], baseline['seconds'])
+    for stage in STAGES:
+        check_time(stage, result['stage_times'][stage], baseline['stage_times'].get(stage, 0.0))
+    if result['peak_mb'] > baseline['peak_mb'] * (1 + args.memory_tolerance):
+        regressions.append('peak_mb: {:.0f} -> {:.0f}'.format(baseline['peak_mb'], result['peak_mb']))
+    if result['n_fits'] > baseline['n_fits'] * (1 + args.fits_tolerance):
+        regressions.append('n_fits: {} -> {}'.format(baseline['n_fits'], result['n_fits']))
+    for y, base_metric in baseline['best_metric'].items():
+        metric = result['best_metric'].get(y)
+        if base_metric is not None and (metric is None or metric < base_metric - args.metric_tolerance):
+            regressions.append('best {} [{}]: {:.4f} -> {}'.format(result['main_metric'].get(y), y, base_metric, metric))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--datasets', nargs='+', default=list(DATASETS.keys()), choices=list(DATASETS.keys()))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', default=None)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--time-tolerance', type=float, default=0.25) #relative
+    parser.add_argument('--min-seconds', type=float, default=0.5) #shorter stages are not compared (noise)
+    parser.add_argument('--memory-tolerance', type=float, default=0.2) #relative
+    parser.add_argument('--fits-tolerance', type=float, default=0.0) #relative
+    parser.add_argument('--metric-tolerance', type=float, default=0.01) #absolute
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_dataset(args.child)))
+        return
+
+    results = {}
+    for name in args.datasets:
+        results[name] = median_run([run_child(name) for _ in range(args.repeat)])
+        r = results[name]
+        print('{:<11} {:7.2f}s | peak {:6.0f}Mb | fits {:3d} | best {} | '.format(
+            name, r['seconds'], r['peak_mb'], r['n_fits']
+            , ', '.join(['{} {:.4f}'.format(y, m) for y, m in r['best_metric'].items() if m is not None]))
+            + ' '.join(['{} {:.2f}'.format(stage, r['stage_times'][stage]) for stage in STAGES]))
+    output = {'python': sys.version.split()[0], 'cpu_count': os.cpu_count(), 'automl_kwargs': AUTOML_KWARGS
+              , 'datasets': results}
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(output, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {'datasets': {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update({k: v for k, v in output.items() if k != 'datasets'})
+        baseline['datasets'].update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print('baseline saved: ' + args.baseline)
+        sys.exit(0)
+    if not os.path.exists(args.baseline):
+        print('no baseline to compare (' + args.baseline + '): run with --save-baseline')
+        sys.exit(0)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    failed = False
+    for name, result in results.items():
+        if name not in baseline['datasets']:
+            print(name + ': not in the baseline')
+            continue
+        for regression in compare(result, baseline['datasets'][name], args):
+            print('FAIL ' + name + ' ' + regression)
+            failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#import time benchmark of autoML: fresh interpreters, median wall time and the slowest imported modules
+#fails (exit code 1) when the median is above --max-seconds or when a lazy dependency is imported eagerly
+#usage: python benchmarks/import_time.py [--repeat 5] [--max-seconds 1.5] [--json results.json]
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#dependencies imported on demand (see the imports of autoML.py)
+LAZY_MODULES = ['ray', 'modin', 'xgboost', 'skopt', 'deap', 'imblearn', 'memory_profiler'
+                , 'seaborn', 'matplotlib', 'sklearn.ensemble', 'sklearn.neural_network']
+
+IMPORT_CODE = '''
+import sys, time, json
+t0 = time.perf_counter()
+import autoML
+elapsed = time.perf_counter() - t0
+print(json.dumps({'seconds': elapsed, 'modules': [m for m in %r if m in sys.modules]}))
+''' % (LAZY_MODULES,)
+
+def run_import():
+    output = subprocess.run([sys.executable, '-c', IMPORT_CODE], cwd=REPO_DIR, check=True
+                            , capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def slowest_modules(top=10):
+    #cumulative time of the modules imported directly by autoML (python -X importtime)
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import autoML'], cwd=REPO_DIR, check=True
+                            , capture_output=True, text=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.startswith('   ') and not name.startswith('    '): #level 1: imported by autoML
+            modules.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(modules, key=lambda m: -m[1])[:top]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=None)
+    parser.add_argument('--json', default=None)
+    args = parser.parse_args()
+
+    runs = [run_import() for _ in range(args.repeat)]
+    seconds = np.array([r['seconds'] for r in runs])
+    eager_modules = sorted(set(m for r in runs for m in r['modules']))
+    result = {'python': sys.version.split()[0]
+              , 'repeat': args.repeat
+              , 'median_seconds': float(np.median(seconds))
+              , 'min_seconds': float(seconds.min())
+              , 'max_seconds': float(seconds.max())
+              , 'eager_lazy_modules': eager_modules
+              , 'slowest_modules': slowest_modules()}
+
+    print('import autoML: median {:.3f}s | min {:.3f}s | max {:.3f}s ({} runs)'.format(
+        result['median_seconds'], result['min_seconds'], result['max_seconds'], args.repeat))
+    for name, cumulative in result['slowest_modules']:
+        print('   {:<45} {:.3f}s'.format(name, cumulative))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    failed = False
+    if len(eager_modules) > 0:
+        print('FAIL: lazy dependencies imported by import autoML: ' + str(eager_modules))
+        failed = True
+    if args.max_seconds is not None and result['median_seconds'] > args.max_seconds:
+        print('FAIL: median import time above {:.3f}s'.format(args.max_seconds))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
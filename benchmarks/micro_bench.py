@@ -0,0 +1,200 @@
+#micro-benchmarks of the hot helper functions of autoML over a rows x cols grid of synthetic data
+#each case is timed --repeat times (after --warmup calls, up to --max-seconds) and reported as percentiles (json with --json)
+#usage: python benchmarks/micro_bench.py [--functions reduce_mem_usage evaluation] [--rows 1000 10000]
+#                                        [--cols 10 100 1000] [--repeat 7] [--max-seconds 30] [--json results.json]
+#meaning of rows x cols by function:
+#   reduce_mem_usage, features_corr_level_*: DataFrame rows x columns
+#   features_corr_level_Y: every column tested against y (per column scipy path), the _batch variant in one call
+#   features_corr_level_X: a single call (first column against all the others), the _batch variant for all the columns
+#   preprocess_text, parallel_tfidf: documents x words per document
+#   evaluation: train rows x features of one individual, fitted by the search with a stub estimator
+#   gen_first_people: warm start seeds (rows) x features
+#   flushResults: calls (rows) of a result row with cols features
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+import autoML
+
+SEED = 1102
+PERCENTILES = [50, 90, 99]
+VOCABULARY = (['car', 'engine', 'brake', 'tire', 'oil', 'door', 'light', 'battery', 'filter', 'belt', 'mirror'
+               , 'seat', 'window', 'radio', 'gear', 'clutch', 'pump', 'valve', 'sensor', 'cable']
+              + ["don't", "won't", "isn't", "it's", "we're", "they'll", 'the', 'and', 'is', 'of', 'to', 'with']
+              + ['part' + str(i) for i in range(200)])
+
+class StubClassifier(ClassifierMixin, BaseEstimator):
+    #constant estimator: evaluation() is timed without the cost of a real model
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+
+    def fit(self, X, y):
+        self.classes_, counts = np.unique(y, return_counts=True)
+        self.prior_ = counts / counts.sum()
+        return self
+
+    def predict(self, X):
+        return np.full(X.shape[0], self.classes_[np.argmax(self.prior_)])
+
+    def predict_proba(self, X):
+        return np.tile(self.prior_, (X.shape[0], 1))
+
+def synthetic_X(rows, cols, random_state):
+    #float64 and int64 columns (the dtypes of a pd.read_csv), y correlated with the first column
+    X = pd.DataFrame(random_state.normal(size=(rows, cols)), columns=['f' + str(i) for i in range(cols)])
+    for col in X.columns[1::3]:
+        X[col] = (X[col] * 100).astype(np.int64)
+    y = (X['f0'] + random_state.normal(scale=0.5, size=rows) > 0).astype(int)
+    return X, y
+
+def synthetic_text(rows, cols, random_state):
+    return pd.Series([' '.join(random_state.choice(VOCABULARY, size=cols)) for _ in range(rows)])
+
+#case setup: returns the function timed by the benchmark (the setup is not timed)
+def setup_reduce_mem_usage(rows, cols, random_state):
+    X, _ = synthetic_X(rows, cols, random_state)
+    return lambda: autoML.reduce_mem_usage(X.copy(), verbose=False)
+
+def setup_features_corr_level_Y(rows, cols, random_state):
+    X, y = synthetic_X(rows, cols, random_state)
+    return lambda: [autoML.features_corr_level_Y(i, X.iloc[:, i], y, 0.01) for i in range(cols)]
+
+def setup_features_corr_level_Y_batch(rows, cols, random_state):
+    X, y = synthetic_X(rows, cols, random_state)
+    return lambda: autoML.features_corr_level_Y_batch(X, y, 0.01)
+
+def setup_features_corr_level_X(rows, cols, random_state):
+    X, _ = synthetic_X(rows, cols, random_state)
+    return lambda: autoML.features_corr_level_X(0, X.iloc[:, 0], X.iloc[:, 1:], 0.99)
+
+def setup_features_corr_level_X_batch(rows, cols, random_state):
+    X, _ = synthetic_X(rows, cols, random_state)
+    return lambda: autoML.features_corr_level_X_batch(X, 0.99)
+
+def setup_preprocess_text(rows, cols, random_state):
+    text_data = synthetic_text(rows, cols, random_state)
+    return lambda: autoML.preprocess_text(text_data)
+
+def setup_parallel_tfidf(rows, cols, random_state):
+    text_data = synthetic_text(rows, cols, random_state)
+    return lambda: autoML.parallel_tfidf('text', text_data)
+
+def setup_evaluation(rows, cols, random_state):
+    #an AutoML with only the stub estimator, prepared by a GA without generations (serial evaluation)
+    X, y = synthetic_X(int(rows / 0.8), cols, random_state) #rows of the train split
+    automl = autoML.AutoML(pd.concat([X, y.rename('y')], axis=1), 'y', algorithms={StubClassifier: {'alpha': [0.1, 0.5, 1.0]}}, ds_name='micro_bench'
+                           , ngen=0, features_engineering=False, n_inter_bayessearch=3, n_folds_cv=3)
+    automl.getResults()
+    automl.worker_data_map['y'] = autoML.share_worker_data(automl, 'y')
+    def run():
+        #new features subset and empty cache: every call fits
+        automl.fitness_cache_map['y'] = {}
+        features = random_state.rand(cols) < 0.5
+        features[0] = True
+        return autoML.evaluation(autoML.Genome(features, 0), automl, 'y')
+    return run
+
+def setup_gen_first_people(rows, cols, random_state):
+    seeds = [(random_state.rand(cols) < 0.5, i % 5) for i in range(rows)]
+    return lambda: autoML.gen_first_people(cols, 5, seeds)
+
+class FlushStub:
+    #attributes read by flushResults
+    def __init__(self):
+        self.ds_name = 'micro_bench'
+        self.start_time = autoML.datetime.now()
+        self.main_metric_map = {'y': 'roc_auc'}
+        self.best_score_map = {}
+        self.scoring_pending = False
+
+def setup_flushResults(rows, cols, random_state):
+    automl_obj = FlushStub()
+    result_row = {'algorithm': StubClassifier(), 'params': {'alpha': 0.5}
+                  , 'features': tuple(['f' + str(i) for i in range(cols)]), 'n_features': cols
+                  , 'train_time': np.float64(0.01), 'predict_time': np.float64(0.001), 'mem_max': 150.0
+                  , 'search_time': 0.1, 'search_cpu_time': 0.1, 'score_time': 0.01
+                  , 'roc_auc': np.float64(0.8), 'f1': np.float64(0.7), 'accuracy': np.float64(0.75)
+                  , 'confusion_matrix': np.array([[10, 2], [3, 9]])}
+    def run():
+        for i in range(rows):
+            autoML.flushResults(automl_obj, 'y', result_row)
+    return run
+
+BENCHMARKS = {'reduce_mem_usage': setup_reduce_mem_usage
+              , 'features_corr_level_Y': setup_features_corr_level_Y
+              , 'features_corr_level_Y_batch': setup_features_corr_level_Y_batch
+              , 'features_corr_level_X': setup_features_corr_level_X
+              , 'features_corr_level_X_batch': setup_features_corr_level_X_batch
+              , 'preprocess_text': setup_preprocess_text
+              , 'parallel_tfidf': setup_parallel_tfidf
+              , 'evaluation': setup_evaluation
+              , 'gen_first_people': setup_gen_first_people
+              , 'flushResults': setup_flushResults}
+
+def time_case(func, repeat, warmup, max_seconds):
+    #stops repeating when the case goes over max_seconds (a slow warmup call is kept as a sample)
+    seconds = []
+    for i in range(warmup + repeat):
+        t0 = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - t0
+        if i < warmup and elapsed <= max_seconds:
+            continue
+        seconds.append(elapsed)
+        if sum(seconds) > max_seconds:
+            break
+    seconds = np.array(seconds)
+    stats = {'repeat': len(seconds)}
+    stats.update({'p' + str(p): float(np.percentile(seconds, p)) for p in PERCENTILES})
+    stats.update({'min': float(seconds.min()), 'mean': float(seconds.mean()), 'max': float(seconds.max())})
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--functions', nargs='+', default=list(BENCHMARKS.keys()), choices=list(BENCHMARKS.keys()))
+    parser.add_argument('--rows', nargs='+', type=int, default=[1000, 10000])
+    parser.add_argument('--cols', nargs='+', type=int, default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--max-seconds', type=float, default=30) #time budget of each case
+    parser.add_argument('--json', default=None)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING) #autoML logs every step
+    #the AutoML/flushResults files are written into a temporary directory
+    work_dir = tempfile.mkdtemp(prefix='micro_bench_')
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    results = []
+    try:
+        for name in args.functions:
+            for rows in args.rows:
+                for cols in args.cols:
+                    func = BENCHMARKS[name](rows, cols, np.random.RandomState(SEED))
+                    stats = time_case(func, args.repeat, args.warmup, args.max_seconds)
+                    results.append(dict({'function': name, 'rows': rows, 'cols': cols}, **stats))
+                    print('{:<28} {:>7} x {:<6} p50 {:10.6f}s | p90 {:10.6f}s | p99 {:10.6f}s ({} runs)'.format(
+                        name, rows, cols, stats['p50'], stats['p90'], stats['p99'], stats['repeat']))
+                    del(func)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'numpy': np.__version__, 'pandas': pd.__version__
+                       , 'cpu_count': os.cpu_count(), 'percentiles': PERCENTILES, 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
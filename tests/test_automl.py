@@ -0,0 +1,252 @@
+#regression tests of autoML (python -m pytest tests/test_automl.py)
+import glob
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import autoML
+from autoML import AutoML, ResultsStore
+
+ALGORITHMS = {KNeighborsClassifier: {'n_neighbors': [3, 5, 7]}
+              , DecisionTreeClassifier: {'max_depth': [None, 3, 6], 'random_state': [1102]}}
+
+def synthetic_ds(rows=300, seed=1102):
+    random_state = np.random.RandomState(seed)
+    ds = pd.DataFrame(random_state.normal(size=(rows, 4)), columns=['a', 'b', 'c', 'd'])
+    ds['y'] = (ds['a'] + ds['b'] + random_state.normal(scale=0.5, size=rows) > 0).astype(int)
+    return ds
+
+@pytest.fixture(autouse=True)
+def seeded():
+    #the GA draws from random and np.random
+    random.seed(1102)
+    np.random.seed(1102)
+
+class SlowClassifier(DecisionTreeClassifier):
+    #every fit takes at least 0.2s: the GA runs out of time before ngen
+    def fit(self, X, y, **kwargs):
+        time.sleep(0.2)
+        return super().fit(X, y, **kwargs)
+
+def test_getresults_twice_keeps_the_results(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) #results/ files
+    automl = AutoML(synthetic_ds(), 'y', algorithms=ALGORITHMS, ds_name='twice', ngen=0
+                    , n_inter_bayessearch=3, n_folds_cv=3)
+    first = automl.getResults()['y']
+    best_first = automl.getBestResult()[automl.main_metric_map['y']]
+    #second call: every genome hits the fitness cache
+    second = automl.getResults()['y']
+    assert len(second) == len(first) > 0
+    assert automl.getBestResult()[automl.main_metric_map['y']] == best_first
+    assert automl.getBestModel() is not None
+    assert 'y' in automl.getPredictor().models
+
+@pytest.mark.parametrize('last_rows', ['nan', 'numeric_first', 'numeric_last'])
+def test_chunked_ingestion_matches_unchunked(tmp_path, monkeypatch, last_rows):
+    #low cardinality text column with a chunk of other values: all NaN (read as float64 by pandas)
+    #or numbers (a numeric chunk before or after the text chunks)
+    monkeypatch.chdir(tmp_path)
+    random_state = np.random.RandomState(1102)
+    ds = synthetic_ds(rows=300)
+    ds['color'] = random_state.choice(['red', 'green', 'blue'], 300)
+    if last_rows == 'nan':
+        ds.loc[200:, 'color'] = np.nan
+    else:
+        rows = slice(0, 99) if last_rows == 'numeric_first' else slice(200, 299)
+        ds.loc[rows, 'color'] = random_state.choice([1, 2, 3], 100)
+    ds.to_csv('chunks.csv', index=False)
+    automl_map = {}
+    for chunksize in [None, 100]:
+        automl_map[chunksize] = AutoML('chunks.csv', 'y', algorithms=ALGORITHMS, ds_name='chunks', ngen=0
+                                       , n_folds_cv=3, ds_chunksize=chunksize)
+    full, chunked = automl_map[None], automl_map[100]
+    assert chunked.hot_columns == full.hot_columns == ['color']
+    assert chunked.str_columns == full.str_columns == []
+    assert list(chunked.X.columns) == list(full.X.columns)
+    np.testing.assert_allclose(chunked.X.sum().to_numpy(dtype=float), full.X.sum().to_numpy(dtype=float), rtol=1e-4)
+    #every row has one color (no value lost as NaN)
+    color_columns = [c for c in full.X.columns if str(c).startswith('color')]
+    assert len(color_columns) == (3 if last_rows == 'nan' else 6) + (last_rows == 'nan')
+
+def test_low_fidelity_skipped_by_the_budget_is_screened_again(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    automl = AutoML(synthetic_ds(), 'y', algorithms=ALGORITHMS, ds_name='low_fidelity', ngen=0
+                    , n_inter_bayessearch=3, n_folds_cv=3, low_fidelity=True, full_tuning_top_frac=1.0)
+    automl.getResults()
+    automl.worker_data_map['y'] = autoML.share_worker_data(automl, 'y')
+    run_fit_tasks = autoML.run_fit_tasks
+    def out_of_budget(automl_obj, tasks, func=autoML.fit_evaluation):
+        if func is autoML.fit_low_fidelity:
+            return [None] * len(tasks)
+        return run_fit_tasks(automl_obj, tasks, func)
+    monkeypatch.setattr(autoML, 'run_fit_tasks', out_of_budget)
+    individual = autoML.Genome([True, False, True, False], 0)
+    cache_key = (automl.selected_algos_map['y'][0], autoML.features2mask(individual.features))
+    assert autoML.evaluation(individual, automl, 'y') == autoML.float2bigint(-1)
+    assert cache_key not in automl.low_fidelity_cache_map['y']
+    #next generation with time left: screened and promoted
+    monkeypatch.setattr(autoML, 'run_fit_tasks', run_fit_tasks)
+    assert autoML.evaluation(individual, automl, 'y') > autoML.float2bigint(0)
+    assert automl.low_fidelity_cache_map['y'][cache_key] > 0
+    assert cache_key in automl.fitness_cache_map['y']
+
+def test_results_store_keeps_the_top_k_and_the_best_of_each_algorithm():
+    random_state = np.random.RandomState(1102)
+    columns = ['algorithm', 'params', 'features', 'n_features', 'train_time', 'predict_time', 'roc_auc', 'confusion_matrix']
+    store = ResultsStore(columns, 'roc_auc', ['a', 'b', 'c'], top_k=3)
+    for i in range(200):
+        algo_class = list(ALGORITHMS.keys())[i % 2]
+        store.append({'algorithm': algo_class(), 'params': {}, 'features': ('a', 'c') if i % 3 else ('b',), 'n_features': 2
+                      , 'train_time': 0.1, 'predict_time': 0.1, 'roc_auc': np.nan if i % 11 == 0 else random_state.rand()})
+    #reference: full sort of all the rows
+    scores = np.nan_to_num(store.column('roc_auc'), nan=-np.inf)
+    algo_ids = store.column('algo_id')
+    rows = sorted(range(len(store)), key=lambda r: (-scores[r], r))
+    expected = set(rows[:3]) | set([min([r for r in rows if algo_ids[r] == a], key=rows.index) for a in [0, 1]])
+    assert set(store.estimators.keys()) == expected
+    assert store.find(KNeighborsClassifier, ('b',)) == 0
+    assert store.find(DecisionTreeClassifier, ('a', 'c')) == 1
+    assert store.find(DecisionTreeClassifier, ('c',)) is None
+    df = store.to_dataframe()
+    assert df['algorithm'].notna().sum() == len(expected)
+    assert set(df['algorithm_class']) == set(ALGORITHMS.keys())
+
+def test_results_store_ties_share_one_order():
+    #accuracy 1.0 ties: the faster predict wins, then the train order
+    columns = ['algorithm', 'params', 'features', 'n_features', 'train_time', 'predict_time', 'accuracy', 'confusion_matrix']
+    store = ResultsStore(columns, 'accuracy', ['a', 'b'], top_k=3)
+    predict_times = [0.5, 0.4, 0.1, 0.3, 0.1, 0.2, np.nan]
+    for predict_time in predict_times:
+        store.append({'algorithm': DecisionTreeClassifier(), 'params': {}, 'features': ('a',), 'n_features': 1
+                      , 'train_time': 0.1, 'predict_time': predict_time, 'accuracy': 1.0})
+    df = store.to_dataframe()
+    assert list(df['train_order']) == [2, 4, 5, 3, 1, 0, 6]
+    assert set(store.estimators.keys()) == {2, 4, 5}
+    assert df['algorithm'].head(3).notna().all()
+    assert store.best_row() == 2
+    assert [e for e, _ in store.best_estimators()] == [store.estimators[r] for r in [2, 4, 5]]
+
+def test_sparse_screening_never_densifies_the_rows(monkeypatch):
+    random_state = np.random.RandomState(1102)
+    X = sparse.random(5000, 300, density=0.01, format='csr', random_state=random_state, dtype=np.float32)
+    #redundant (scaled copies) and constant columns
+    X = sparse.hstack([X, X[:, :5] * 2, sparse.csr_matrix(np.ones((5000, 1), dtype=np.float32))], format='csr')
+    y = (X[:, 0].toarray().ravel() + random_state.normal(scale=0.01, size=5000) > 0.005).astype(int)
+    X_dense = X.toarray()
+    expected_Y = autoML.features_corr_level_Y_batch(X_dense, y, 0.01)
+    expected_X = autoML.features_corr_level_X_batch(X_dense, 0.99, block_size=64)
+
+    def toarray_spy(original):
+        def toarray(self, *args, **kwargs):
+            #only the small gram blocks (block_size x block_size) may be dense
+            if self.shape[0] == X.shape[0]:
+                raise AssertionError('sparse X densified: ' + str(self.shape))
+            return original(self, *args, **kwargs)
+        return toarray
+    for cls in [sparse.csr_matrix, sparse.csc_matrix]:
+        monkeypatch.setattr(cls, 'toarray', toarray_spy(cls.toarray))
+        monkeypatch.setattr(cls, 'todense', toarray_spy(cls.todense))
+    assert autoML.features_corr_level_Y_batch(X, y, 0.01) == expected_Y
+    assert autoML.features_corr_level_X_batch(X, 0.99, block_size=64) == expected_X
+    #columns 0-4 have a later scaled copy (300-304), 305 is constant
+    assert set(expected_X).isdisjoint([0, 1, 2, 3, 4, 305]) and 300 in expected_X
+
+def test_sparse_mode_keeps_x_sparse(tmp_path, monkeypatch):
+    #TF-IDF and one hot features in a CSR matrix from the preprocessing to the GA
+    monkeypatch.chdir(tmp_path)
+    random_state = np.random.RandomState(1102)
+    ds = synthetic_ds()
+    words = ['engine', 'brake', 'tire', 'oil', 'door', 'light', 'battery', 'filter', 'belt', 'mirror']
+    ds['text'] = [' '.join(random_state.choice(words, 4)) + (' broken' if y else '') for y in ds['y']]
+    ds['color'] = random_state.choice(['red', 'green', 'blue'], len(ds))
+    automl = AutoML(ds, 'y', algorithms=ALGORITHMS, ds_name='sparse', ngen=1, n_inter_bayessearch=3, n_folds_cv=3
+                    , sparse_features=True, do_redundance_test_X=True)
+    assert automl.str_columns == ['text'] and automl.hot_columns == ['color']
+    assert sparse.issparse(automl.X) and sparse.issparse(automl.X_train_map['y'])
+    assert 'text_broken' in list(automl.getFeaturesNames('y'))
+    assert len(automl.getResults()['y']) > 0
+    assert automl.getBestResult()[automl.main_metric_map['y']] > 0.9
+
+def test_successive_halving_on_n_estimators(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    algorithms = {RandomForestClassifier: {'n_estimators': [10, 20, 40], 'max_depth': [None, 3, 6], 'random_state': [1102]}}
+    automl = AutoML(synthetic_ds(), 'y', algorithms=algorithms, ds_name='halving', ngen=1, n_folds_cv=3
+                    , successive_halving=True, halving_resource='n_estimators', halving_factor=2)
+    results = automl.getResults()['y']
+    assert len(results) > 0
+    #the last round (and the refit) uses all the estimators
+    assert all([params['n_estimators'] == 40 for params in results['params']])
+    assert all([model is None or model.n_estimators == 40 for model in results['algorithm']])
+
+def test_low_fidelity_tunes_only_the_top_individuals(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    automl = AutoML(synthetic_ds(), 'y', algorithms=ALGORITHMS, ds_name='low_fidelity', ngen=3
+                    , n_inter_bayessearch=3, n_folds_cv=3, low_fidelity=True, full_tuning_top_frac=0.2)
+    results = automl.getResults()['y']
+    screened = len(automl.low_fidelity_cache_map['y'])
+    assert automl.stats_map['y']['fits'] == len(results) > 0
+    assert automl.stats_map['y']['fits'] < screened
+
+def test_time_budget_stops_the_ga(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    algorithms = {SlowClassifier: {'max_depth': [None, 3, 6]}, KNeighborsClassifier: {'n_neighbors': [3, 5, 7], 'n_jobs': [-1]}}
+    t0 = time.perf_counter()
+    automl = AutoML(synthetic_ds(), 'y', algorithms=algorithms, ds_name='budget', ngen=100, n_inter_bayessearch=3
+                    , n_folds_cv=3, time_budget=4, n_cores=1)
+    automl.getResults()
+    #serial evaluation: soft limit (the running search finishes)
+    assert time.perf_counter() - t0 < 15
+    assert automl.ga_stop_reason_map['y'] == 'time_budget'
+    assert len(automl.ga_logbook_map['y']) - 1 < 100
+    #cores budget: the user search spaces run single threaded
+    assert automl.algorithms[KNeighborsClassifier]['n_jobs'] == [1]
+    assert automl.search_n_jobs == automl.targets_n_jobs == 1
+
+def test_warm_start_seeds_the_hall_of_fame(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ds = synthetic_ds()
+    first = AutoML(ds, 'y', algorithms=ALGORITHMS, ds_name='first', ngen=2, n_inter_bayessearch=3, n_folds_cv=3, ga_hof_size=3)
+    first.getResults()
+    hof_path = glob.glob(os.path.join('results', '*HALL_OF_FAME_FIRST_Y*'))[0]
+    records = autoML.load(hof_path)
+    assert len(records) > 0
+    #no generations: only the first population (all the features of each algorithm and the seeds)
+    second = AutoML(ds, 'y', algorithms=ALGORITHMS, ds_name='second', ngen=0, n_inter_bayessearch=3, n_folds_cv=3
+                    , warm_start_from=hof_path)
+    second.getResults()
+    for record in records:
+        assert second.results['y'].find(record['algorithm'], record['features']) is not None
+    #first population: all the features of each algorithm plus the hall of fame individuals
+    all_features = tuple(second.getFeaturesNames('y'))
+    expected = set([(r['algorithm'], r['features']) for r in records]) | set([(a, all_features) for a in ALGORITHMS])
+    assert len(second.results['y']) == len(expected)
+    assert len(second.warm_params_map['y']) > 0
+
+def test_predictor_fast_path_matches_the_pipeline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    random_state = np.random.RandomState(1102)
+    ds = synthetic_ds()
+    ds['color'] = random_state.choice(['red', 'green', 'blue'], len(ds))
+    automl = AutoML(ds, 'y', algorithms=ALGORITHMS, ds_name='predictor', ngen=1, n_inter_bayessearch=3, n_folds_cv=3)
+    automl.getResults()
+    predictor = automl.getPredictor()
+    records = ds.drop('y', axis=1).head(20).to_dict('records')
+    model, features = autoML.best_models(automl)['y']
+    X = automl.preprocessing.take(automl.preprocessing.transform(pd.DataFrame(records)), features, dense=True)
+    expected = model.predict(np.asarray(X))
+    #no missing values: the records never go through the DataFrame pipeline
+    def no_pipeline(self, X):
+        raise AssertionError('slow path')
+    monkeypatch.setattr(autoML.PreprocessingPipeline, 'transform', no_pipeline)
+    np.testing.assert_array_equal(predictor.predict(records, 'y'), expected)
+    np.testing.assert_array_equal(predictor.predict(records[0], 'y'), expected[:1])